@@ -36,16 +36,25 @@ class Config:
             'port': 18080,
             'debug': False,
             'reload': False,
+            'workers': 1,
         },
         
         # 文件存储配置
         'storage': {
             'upload_dir': 'uploads',
+            'fsync_uploads': False,  # 保存上传文件后是否强制落盘
+        },
+        
+        # 转换任务配置
+        'convert': {
+            'max_workers': 1,  # 转换工作进程数，每个进程各自加载OCR模型；0表示按CPU核数设置
+            'max_tasks': 1000,  # 内存中保留的任务状态上限
         },
         
         # 安全配置
         'security': {
             'cors_origins': ["*"],
+            'enable_middleware': False,  # 是否启用请求级安全检查中间件
         }
     }
     
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, status, Header, Path
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, status, Header, Path, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
+import os
 import logging
 from service.file_service import FileService
 from service.convert_service import ConvertService
@@ -23,14 +26,14 @@ def get_convert_service() -> ConvertService:
     """获取转换服务实例"""
     return convert_service
 
+# 有效的API Key集合，可通过环境变量API_KEYS（逗号分隔）覆盖
+_VALID_API_KEYS = frozenset(
+    key.strip() for key in os.environ.get("API_KEYS", "12345,67890").split(",") if key.strip()
+)
+
 async def api_key_auth(api_key: str = Header(..., alias="X-API-Key")):
     """API Key认证依赖"""
-    # 验证API Key的逻辑
-    valid_keys = [
-        "12345", 
-        "67890"
-        ]  # 可以从环境变量或配置文件中读取
-    if api_key not in valid_keys:
+    if api_key not in _VALID_API_KEYS:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的API Key"
@@ -70,10 +73,9 @@ async def upload_file(
             detail="文件类型不允许"
         )
 
-    # 读取文件内容并保存
+    # 直接从上传的临时文件分块保存，不把整个文件读入内存；磁盘写入放到线程池，避免阻塞事件循环
     try:
-        file_content = await file.read()
-        result = file_service.save_file(file_content, file.filename)
+        result = await run_in_threadpool(file_service.save_file, file.file, file.filename)
         
         return result
     except Exception as e:
@@ -97,11 +99,11 @@ async def delete_file(
     文件删除接口
     """
     try:
-        logger.info(f"删除文件: {file_id}")
+        logger.info("删除文件: %s", file_id)
         result = file_service.delete_file(file_id)
         return result
     except Exception as e:
-        logger.error(f"删除文件失败: {file_id}, 错误: {str(e)}")
+        logger.error("删除文件失败: %s, 错误: %s", file_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"文件删除失败: {str(e)}"
@@ -122,18 +124,18 @@ async def get_file_info(
     文件信息查询接口
     """
     try:
-        logger.info(f"查询文件信息: {file_id}")
+        logger.info("查询文件信息: %s", file_id)
         file_info = file_service.get_file_info(file_id)
         if file_info:
             return file_info
         else:
-            logger.warning(f"文件不存在: {file_id}")
+            logger.warning("文件不存在: %s", file_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"文件ID {file_id} 不存在"
             )
     except Exception as e:
-        logger.error(f"查询文件信息失败: {file_id}, 错误: {str(e)}")
+        logger.error("查询文件信息失败: %s, 错误: %s", file_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"文件信息查询失败: {str(e)}"
@@ -146,6 +148,8 @@ async def get_file_info(
     description="查询服务器上所有已上传文件的信息"
 )
 async def list_files(
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="返回的最大文件数，不传则返回全部"),
+    offset: int = Query(0, ge=0, description="跳过的文件数"),
     file_service: FileService = Depends(get_file_service),
     _: str = Depends(api_key_auth)
 ) -> Dict[str, Any]:
@@ -153,7 +157,7 @@ async def list_files(
     文件列表查询接口
     """
     try:
-        file_list = file_service.list_files()
+        file_list = file_service.list_files(limit=limit, offset=offset)
         return file_list
     except Exception as e:
         raise HTTPException(
@@ -184,28 +188,31 @@ class ConvertTaskResultResponse(BaseModel):
     "/convert2md",
     status_code=status.HTTP_200_OK,
     summary="启动异步文件转换任务",
-    description="根据文件ID启动异步文件转换为Markdown任务，返回任务ID"
+    description="根据文件ID启动异步文件转换为Markdown任务，返回任务ID",
+    # 直接返回字典，不再经过响应模型校验；模型仅用于接口文档
+    response_model=None,
+    responses={200: {"model": ConvertTaskStartResponse}}
 )
 async def start_convert_task(
     request: ConvertTaskRequest,
     convert_service: ConvertService = Depends(get_convert_service),
     _: str = Depends(api_key_auth)
-) -> ConvertTaskStartResponse:
+) -> Dict[str, Any]:
     """
     启动异步文件转换任务
     """
     try:
         task_id = convert_service.start_convert_task(request.file_id)
         
-        return ConvertTaskStartResponse(
-            task_id=task_id,
-            message="转换任务已启动",
-            file_id=request.file_id
-        )
+        return {
+            'task_id': task_id,
+            'message': "转换任务已启动",
+            'file_id': request.file_id
+        }
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"启动转换任务失败: {str(e)}")
+        logger.error("启动转换任务失败: %s", e)
         raise HTTPException(
             status_code=status.HTTP_200_OK,
             detail=f"启动转换任务失败: {str(e)}"
@@ -215,31 +222,29 @@ async def start_convert_task(
     "/convert2md/result/{task_id}",
     status_code=status.HTTP_200_OK,
     summary="查询转换任务结果",
-    description="根据任务ID查询文件转换任务的结果"
+    description="根据任务ID查询文件转换任务的结果",
+    # 任务状态已是响应格式，直接返回字典，不再经过响应模型校验；模型仅用于接口文档
+    response_model=None,
+    responses={200: {"model": ConvertTaskResultResponse}}
 )
 async def get_convert_task_result(
     task_id: str = Path(..., description="转换任务ID"),
+    wait: float = Query(0, ge=0, le=300, description="等待任务完成的最长秒数，0表示立即返回"),
     convert_service: ConvertService = Depends(get_convert_service),
     _: str = Depends(api_key_auth)
-) -> ConvertTaskResultResponse:
+) -> Dict[str, Any]:
     """
     查询转换任务结果
     """
     try:
-        logger.info(f"查询转换任务: {task_id}")
-        task_status = convert_service.get_task_status(task_id)
-        logger.info(f"查询转换任务结果: {task_status}")
-
-        return ConvertTaskResultResponse(
-            task_id=task_status['task_id'],
-            file_id=task_status['file_id'],
-            status=task_status['status'],
-            progress=task_status['progress'],
-            result=task_status['result'],
-            error=task_status['error'],
-            start_time=task_status['start_time'],
-            end_time=task_status['end_time']
-        )
+        logger.info("查询转换任务: %s", task_id)
+        if wait > 0:
+            task_status = await convert_service.wait_for_task(task_id, wait)
+        else:
+            task_status = convert_service.get_task_status(task_id)
+        logger.info("查询转换任务结果: %s", task_status)
+
+        return task_status
     except HTTPException:
         raise
     except Exception as e:
@@ -247,3 +252,22 @@ async def get_convert_task_result(
             status_code=status.HTTP_200_OK,
             detail=f"查询转换任务结果失败: {str(e)}"
         )
+
+@file_router.get(
+    "/convert2md/content/{task_id}",
+    status_code=status.HTTP_200_OK,
+    summary="获取转换后的Markdown内容",
+    description="根据任务ID下载已完成转换任务生成的Markdown文件",
+    response_class=FileResponse
+)
+async def get_convert_task_content(
+    task_id: str = Path(..., description="转换任务ID"),
+    convert_service: ConvertService = Depends(get_convert_service),
+    _: str = Depends(api_key_auth)
+):
+    """
+    获取转换后的Markdown内容
+    """
+    output_path = convert_service.get_task_output_path(task_id)
+    # 直接从磁盘流式返回文件，不在内存中保留Markdown内容
+    return FileResponse(output_path, media_type="text/markdown; charset=utf-8")
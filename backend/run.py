@@ -1,169 +1,243 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 import os
 import sys
+import time
 import logging
 import logging.config
+from contextlib import asynccontextmanager
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from routes.file_routes import file_router
 from config import get_config
+from utils.logger import start_queue_logging, stop_queue_logging
+from security import SecurityMiddleware
 
-# 加载日志配置
+# 日志配置文件路径
 log_config_path = os.path.join(os.path.dirname(__file__), 'logging.conf')
-if os.path.exists(log_config_path):
-    logging.config.fileConfig(log_config_path)
-else:
-    # 如果配置文件不存在，则使用基本配置
-    logging.basicConfig(level=logging.INFO)
+
+def setup_logging():
+    """加载日志配置"""
+    if os.path.exists(log_config_path):
+        logging.config.fileConfig(log_config_path)
+    else:
+        # 如果配置文件不存在，则使用基本配置
+        logging.basicConfig(level=logging.INFO)
 
 # 获取日志记录器
-logger = logging.getLogger("uvicorn.access")
-
-
-# 初始化配置
-config = get_config()
-
-# FastAPI应用配置
-app = FastAPI(
-    title="FileConverter API",
-    version="1.0.0",
-    description="文件转换API",
-    docs_url="/docs",
-    redoc_url="/redoc"
-)
-
-# 添加CORS中间件
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=config.get('security.cors_origins', ["*"]),
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# 请求日志和未处理异常使用应用自己的日志记录器：uvicorn关闭访问日志时会清空uvicorn.access的处理器
+logger = logging.getLogger("route.access")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期管理"""
+    from routes.file_routes import convert_service
+    # 请求日志改为队列异步写出，请求处理路径上不做文件和控制台I/O（QueueHandler仍会在调用线程中格式化消息）
+    # 在启动阶段切换，避免被uvicorn加载日志配置时覆盖
+    log_listener = start_queue_logging(logger)
+    # 预热转换工作进程，OCR模型在启动阶段初始化，不占用首个请求的处理时间
+    convert_service.warm_up()
+    try:
+        yield
+    finally:
+        stop_queue_logging(logger, log_listener)
 
 # 自定义中间件：请求日志记录
-@app.middleware("http")
-async def log_requests(request, call_next):
-    """记录请求日志的中间件"""
-    import time
+class TimingMiddleware:
+    """
+    记录请求日志并添加处理时间响应头的纯ASGI中间件
     
-    start_time = time.time()
+    只包装send以读取响应状态，不经过BaseHTTPMiddleware的任务和流包装开销
+    """
     
-    # 记录请求信息
-    logger.info(f"Request: {request.method} {request.url.path} - Client: {request.client.host if request.client else 'unknown'}")
+    def __init__(self, app):
+        self.app = app
     
-    try:
-        response = await call_next(request)
-        process_time = time.time() - start_time
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # 记录响应信息
-        logger.info(f"Response: {request.method} {request.url.path} - Status: {response.status_code} - Time: {process_time:.2f}s")
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        client = scope.get("client")
         
-        # 添加处理时间到响应头
-        response.headers["X-Process-Time"] = str(process_time)
+        # 记录请求信息
+        logger.info("Request: %s %s - Client: %s", method, path, client[0] if client else 'unknown')
         
-        return response
-    except Exception as exc:
-        process_time = time.time() - start_time
-        logger.error(f"Error: {request.method} {request.url.path} - Exception: {str(exc)} - Time: {process_time:.2f}s")
-        raise
-
-# 全局异常处理
-@app.exception_handler(RequestValidationError)
-async def validation_exception_handler(request, exc):
-    """请求验证错误处理"""
-    return JSONResponse(
-        status_code=422,
-        content={
-            "detail": "请求参数验证失败",
-            "errors": exc.errors(),
-            "path": request.url.path,
-            "method": request.method
-        }
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                process_time = time.perf_counter() - start_time
+                
+                # 记录响应信息
+                logger.info("Response: %s %s - Status: %s - Time: %.2fs", method, path, message['status'], process_time)
+                
+                # 添加处理时间到响应头
+                headers = list(message.get("headers", []))
+                headers.append((b"x-process-time", f"{process_time:.3f}".encode()))
+                message["headers"] = headers
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            process_time = time.perf_counter() - start_time
+            logger.error("Error: %s %s - Exception: %s - Time: %.2fs", method, path, exc, process_time)
+            raise
+
+def create_app() -> FastAPI:
+    """
+    创建FastAPI应用
+    
+    应用、路由和服务实例只在调用时创建：转换工作进程以spawn方式启动时会重新执行本文件，
+    模块级不创建任何实例，子进程中不会再多出一套应用、进程池和日志文件处理器
+    """
+    setup_logging()
+    config = get_config()
+    # 路由模块导入时创建文件服务和转换服务实例
+    from routes.file_routes import file_router
+
+    # FastAPI应用配置
+    app = FastAPI(
+        title="FileConverter API",
+        version="1.0.0",
+        description="文件转换API",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        # 使用orjson序列化响应，替代标准库json
+        default_response_class=ORJSONResponse,
+        lifespan=lifespan
     )
 
-@app.exception_handler(StarletteHTTPException)
-async def http_exception_handler(request, exc):
-    """HTTP异常处理"""
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={
-            "detail": exc.detail,
-            "status_code": exc.status_code,
-            "path": request.url.path,
-            "method": request.method
-        }
+    # 添加安全检查中间件：扫描查询参数中的注入特征
+    # 检测规则较宽泛（如ls、more、;等），会误拦截正常参数，需在配置中显式启用
+    # 客户端通过X-API-Key认证，暂不强制CSRF令牌
+    if config.get('security.enable_middleware', False):
+        app.add_middleware(SecurityMiddleware, enforce_csrf=False)
+
+    # 添加CORS中间件
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=config.get('security.cors_origins', ["*"]),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
     )
 
-@app.exception_handler(Exception)
-async def general_exception_handler(request, exc):
-    """通用异常处理"""
-    import traceback
+    app.add_middleware(TimingMiddleware)
+
+    # 全局异常处理
+    @app.exception_handler(RequestValidationError)
+    async def validation_exception_handler(request, exc):
+        """请求验证错误处理"""
+        return ORJSONResponse(
+            status_code=422,
+            content={
+                "detail": "请求参数验证失败",
+                "errors": exc.errors(),
+                "path": request.url.path,
+                "method": request.method
+            }
+        )
+
+    @app.exception_handler(StarletteHTTPException)
+    async def http_exception_handler(request, exc):
+        """HTTP异常处理"""
+        return ORJSONResponse(
+            status_code=exc.status_code,
+            content={
+                "detail": exc.detail,
+                "status_code": exc.status_code,
+                "path": request.url.path,
+                "method": request.method
+            }
+        )
+
+    @app.exception_handler(Exception)
+    async def general_exception_handler(request, exc):
+        """通用异常处理"""
+        import traceback
     
-    # 记录详细错误信息到日志
-    logger.error(f"Unhandled exception: {str(exc)}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
+        # 记录详细错误信息到日志
+        logger.error(f"Unhandled exception: {str(exc)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
     
-    return JSONResponse(
-        status_code=500,
-        content={
-            "detail": "服务器内部错误",
-            "error": str(exc) if os.environ.get('DEBUG') == 'True' else "Internal server error",
-            "path": request.url.path,
-            "method": request.method
+        return ORJSONResponse(
+            status_code=500,
+            content={
+                "detail": "服务器内部错误",
+                "error": str(exc) if os.environ.get('DEBUG') == 'True' else "Internal server error",
+                "path": request.url.path,
+                "method": request.method
+            }
+        )
+
+    # 注册路由
+    app.include_router(file_router, prefix="/api", tags=["file"])
+
+    @app.get("/", summary="API根路径", description="返回API基本信息")
+    async def root():
+        """API根路径"""
+        return {
+            "message": "Welcome to FileConverter API",
+            "status": "running",
+            "version": "1.0.0",
+            "docs": "/docs"
         }
-    )
 
-# 注册路由
-app.include_router(file_router, prefix="/api", tags=["file"])
-
-@app.get("/", summary="API根路径", description="返回API基本信息")
-async def root():
-    """API根路径"""
-    return {
-        "message": "Welcome to FileConverter API",
-        "status": "running",
-        "version": "1.0.0",
-        "docs": "/docs"
-    }
-
-@app.get("/health", summary="健康检查", description="检查API服务状态")
-async def health_check():
-    """健康检查端点"""
-    return {
-        "status": "healthy",
-        "timestamp": "2026-01-05T22:20:00Z"
-    }
+    @app.get("/health", summary="健康检查", description="检查API服务状态")
+    async def health_check():
+        """健康检查端点"""
+        return {
+            "status": "healthy",
+            "timestamp": "2026-01-05T22:20:00Z"
+        }
+
+    return app
 
 if __name__ == '__main__':
     import uvicorn
-    import logging
 
     # 从配置中获取服务器设置
-    server_config = config.get_server_config()
+    server_config = get_config().get_server_config()
     host = server_config.get('host', '0.0.0.0')
     port = server_config.get('port', 18080)
     debug = server_config.get('debug', False)
     reload = server_config.get('reload', False)
+    # 工作进程数，可通过环境变量WORKERS覆盖
+    # 转换任务状态保存在进程内存中，多进程时查询请求可能落到其他进程，默认单进程
+    workers = int(os.environ.get('WORKERS', server_config.get('workers', 1)))
+    # 多进程和热重载由uvicorn在各进程中调用create_app创建应用；单进程直接创建应用
+    use_factory = workers > 1 or reload
+    if use_factory:
+        setup_logging()
+    else:
+        app = create_app()
     
     # 获取专门用于应用启动的日志记录器
     startup_logger = logging.getLogger("uvicorn.error")
     startup_logger.info(f"启动服务器: {host}:{port}")
     startup_logger.info(f"调试模式: {debug}")
     startup_logger.info(f"热重载: {reload}")
+    startup_logger.info(f"工作进程数: {workers}")
     
     uvicorn.run(
-        app, 
+        "run:create_app" if use_factory else app,
+        factory=use_factory,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
         host=host, 
         port=port,
+        workers=workers,
         log_config=log_config_path,  # 使用统一的日志配置
-        reload=reload
+        reload=reload,
+        # 显式使用uvloop事件循环和httptools解析器（uvloop不支持Windows）
+        loop="uvloop" if sys.platform != "win32" else "asyncio",
+        http="httptools",
+        # 请求日志已由TimingMiddleware记录，关闭uvicorn自带的访问日志
+        access_log=False
     )
-
-    
\ No newline at end of file
@@ -7,12 +7,15 @@ import re
 import html
 import os
 import secrets
-import hashlib
-import time
-from functools import wraps
-from typing import Dict, Any, Tuple, Optional, List
-from fastapi import HTTPException, Request, Depends, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import parse_qsl
+from fastapi import HTTPException, Request, status
+from fastapi.responses import ORJSONResponse
+
+
+# 清理输入时需要移除的危险字符
+_STRIP_TABLE = str.maketrans('', '', '<>"\'')
 
 
 class SecurityValidator:
@@ -28,64 +31,61 @@ class SecurityValidator:
     # 安全的文件扩展名
     SAFE_PDF_EXTENSIONS = {'.pdf'}
     
-    # SQL注入检测模式
-    SQL_INJECTION_PATTERNS = [
-        r"(?i)(union\s+select)",
-        r"(?i)(drop\s+table)",
-        r"(?i)(create\s+table)",
-        r"(?i)(insert\s+into)",
-        r"(?i)(delete\s+from)",
-        r"(?i)(update\s+\w+\s+set)",
-        r"(?i)(exec\s*\()",
-        r"(?i)(execute\s*\()",
-        r"(?i)(sp_)",
-        r"(?i)(;|--|/\*|\*/|xp_)",
-        r"(?i)(\bselect\b|\bfrom\b|\bwhere\b|\border\s+by\b|\bgroup\s+by\b|\bhaving\b)",
-    ]
+    # SQL注入检测模式（类加载时预编译，避免每次请求重复查找正则缓存）
+    SQL_INJECTION_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+        r"(union\s+select)",
+        r"(drop\s+table)",
+        r"(create\s+table)",
+        r"(insert\s+into)",
+        r"(delete\s+from)",
+        r"(update\s+\w+\s+set)",
+        r"(exec\s*\()",
+        r"(execute\s*\()",
+        r"(sp_)",
+        r"(;|--|/\*|\*/|xp_)",
+        r"(\bselect\b|\bfrom\b|\bwhere\b|\border\s+by\b|\bgroup\s+by\b|\bhaving\b)",
+    ))
     
     # XSS检测模式
-    XSS_PATTERNS = [
-        r"(?i)<script",
-        r"(?i)</script>",
-        r"(?i)javascript:",
-        r"(?i)vbscript:",
-        r"(?i)on\w+\s*=",
-        r"(?i)expression\s*\()",
-        r"(?i)eval\s*\()",
-        r"(?i)alert\s*\()",
-        r"(?i)<iframe",
-        r"(?i)</iframe>",
-        r"(?i)<object",
-        r"(?i)</object>",
-        r"(?i)<embed",
-        r"(?i)</embed>",
-        r"(?i)data:",
-    ]
+    XSS_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+        r"<script",
+        r"</script>",
+        r"javascript:",
+        r"vbscript:",
+        r"on\w+\s*=",
+        r"expression\s*\(",
+        r"eval\s*\(",
+        r"alert\s*\(",
+        r"<iframe",
+        r"</iframe>",
+        r"<object",
+        r"</object>",
+        r"<embed",
+        r"</embed>",
+        r"data:",
+    ))
     
     # 命令注入检测模式
-    COMMAND_INJECTION_PATTERNS = [
-        r"(?i)(\|)",
-        r"(?i)(;)",
-        r"(?i)(`)",
-        r"(?i)(&&)",
-        r"(?i)(\|\|)",
-        r"(?i)(\bcurl\b|\bwget\b|\bnc\b|\bncat\b|\btelnet\b)",
-        r"(?i)(\bcat\b|\bless\b|\bmore\b|\bhead\b|\btail\b)",
-        r"(?i)(\bsh\b|\bbash\b|\bpowershell\b|\bcmd\b)",
-        r"(?i)(\bchmod\b|\bchown\b|\bkill\b|\bps\b|\bls\b|\bcp\b|\bm\b|\brm\b)",
-        r"(?i)(\bnc\b|\bnetcat\b|\bsocat\b|\bnmap\b)",
-        r"(?i)(\$\(|\${",
-    ]
+    COMMAND_INJECTION_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+        r"(\|)",
+        r"(;)",
+        r"(`)",
+        r"(&&)",
+        r"(\|\|)",
+        r"(\bcurl\b|\bwget\b|\bnc\b|\bncat\b|\btelnet\b)",
+        r"(\bcat\b|\bless\b|\bmore\b|\bhead\b|\btail\b)",
+        r"(\bsh\b|\bbash\b|\bpowershell\b|\bcmd\b)",
+        r"(\bchmod\b|\bchown\b|\bkill\b|\bps\b|\bls\b|\bcp\b|\bm\b|\brm\b)",
+        r"(\bnc\b|\bnetcat\b|\bsocat\b|\bnmap\b)",
+        r"(\$\(|\$\{)",
+    ))
     
     @staticmethod
     def sanitize_input(input_data):
         """清理输入数据"""
         if isinstance(input_data, str):
-            # HTML转义
-            sanitized = html.escape(input_data)
-            # 移除潜在的危险字符
-            sanitized = re.sub(r'[<>"\']', '', sanitized)
-            return sanitized
+            # HTML转义后移除潜在的危险字符
+            return html.escape(input_data).translate(_STRIP_TABLE)
         elif isinstance(input_data, dict):
             sanitized_dict = {}
             for key, value in input_data.items():
@@ -100,9 +100,7 @@ class SecurityValidator:
     def validate_sql_injection(input_data):
         """检测SQL注入"""
         if isinstance(input_data, str):
-            for pattern in SecurityValidator.SQL_INJECTION_PATTERNS:
-                if re.search(pattern, input_data):
-                    return False
+            return _SQLI_RE.search(input_data) is None
         elif isinstance(input_data, dict):
             for value in input_data.values():
                 if not SecurityValidator.validate_sql_injection(value):
@@ -117,9 +115,7 @@ class SecurityValidator:
     def validate_xss(input_data):
         """检测XSS攻击"""
         if isinstance(input_data, str):
-            for pattern in SecurityValidator.XSS_PATTERNS:
-                if re.search(pattern, input_data):
-                    return False
+            return _XSS_RE.search(input_data) is None
         elif isinstance(input_data, dict):
             for value in input_data.values():
                 if not SecurityValidator.validate_xss(value):
@@ -134,9 +130,7 @@ class SecurityValidator:
     def validate_command_injection(input_data):
         """检测命令注入"""
         if isinstance(input_data, str):
-            for pattern in SecurityValidator.COMMAND_INJECTION_PATTERNS:
-                if re.search(pattern, input_data):
-                    return False
+            return _CMDI_RE.search(input_data) is None
         elif isinstance(input_data, dict):
             for value in input_data.values():
                 if not SecurityValidator.validate_command_injection(value):
@@ -148,6 +142,7 @@ class SecurityValidator:
         return True
     
     @staticmethod
+    @lru_cache(maxsize=4096)
     def validate_filename(filename):
         """验证文件名安全"""
         # 简单的文件名清理
@@ -165,6 +160,7 @@ class SecurityValidator:
         return True, safe_filename
     
     @staticmethod
+    @lru_cache(maxsize=4096)
     def validate_pdf_file(filename):
         """验证PDF文件"""
         if not filename or filename == '':
@@ -190,19 +186,16 @@ class SecurityValidator:
     @staticmethod
     def validate_csrf_token(request: Request, token: Optional[str] = None):
         """验证CSRF令牌"""
-        # 从请求头或查询参数获取令牌
-        if not token:
+        # 调用方未传入令牌时，从请求头或查询参数获取
+        if not token and request is not None:
             token = request.headers.get('X-CSRF-Token') or request.query_params.get('csrf_token')
         
         if not token:
             return False
         
-        # 在实际应用中，这里应该验证令牌是否有效
-        # 简化实现：检查令牌格式
-        if len(token) != 64:  # 32字节的十六进制字符串
-            return False
-        
-        return True
+        # 只检查令牌格式：签发的令牌目前没有下发给客户端的途径，
+        # 且多工作进程间不共享令牌，无法校验令牌是否由本服务签发
+        return len(token) == 64  # 32字节的十六进制字符串
     
     @staticmethod
     def validate_idor(user_id, resource_owner_id):
@@ -221,16 +214,49 @@ class SecurityValidator:
         return True  # 简化返回，实际实现会更复杂
 
 
-# FastAPI依赖项
-security = HTTPBearer()
+def _fuse_patterns(patterns) -> re.Pattern:
+    """将同类检测模式合并为单个交替正则，每个值只需一次扫描"""
+    return re.compile("|".join(f"(?:{p.pattern})" for p in patterns), re.IGNORECASE)
+
 
+_SQLI_RE = _fuse_patterns(SecurityValidator.SQL_INJECTION_PATTERNS)
+_XSS_RE = _fuse_patterns(SecurityValidator.XSS_PATTERNS)
+_CMDI_RE = _fuse_patterns(SecurityValidator.COMMAND_INJECTION_PATTERNS)
+# 三类模式的合并正则，用于快速排除正常输入
+_THREAT_RE = _fuse_patterns(
+    SecurityValidator.SQL_INJECTION_PATTERNS
+    + SecurityValidator.XSS_PATTERNS
+    + SecurityValidator.COMMAND_INJECTION_PATTERNS
+)
+
+
+# 无需CSRF校验的安全请求方法
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'TRACE'})
+
+
+def _detect_threat(value: str) -> Optional[str]:
+    """检测单个输入值，返回对应的错误信息，未发现攻击特征时返回None"""
+    # 正常输入只需一次扫描，命中后再区分攻击类型
+    if _THREAT_RE.search(value) is None:
+        return None
+    if _SQLI_RE.search(value):
+        return "检测到SQL注入尝试"
+    if _XSS_RE.search(value):
+        return "检测到XSS尝试"
+    if _CMDI_RE.search(value):
+        return "检测到命令注入尝试"
+    return None
+
+
+# FastAPI依赖项
 
 async def csrf_protect(request: Request) -> str:
     """CSRF保护依赖项"""
     # 对于非GET、HEAD、OPTIONS、TRACE请求，验证CSRF令牌
-    if request.method not in ['GET', 'HEAD', 'OPTIONS', 'TRACE']:
+    if request.method not in SAFE_METHODS:
         token = request.headers.get('X-CSRF-Token') or request.query_params.get('csrf_token')
-        if not SecurityValidator.validate_csrf_token(request, token):
+        # 令牌已在此读取，缺失时直接判定失败，不再重复查找请求头
+        if not token or not SecurityValidator.validate_csrf_token(request, token):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="CSRF验证失败"
@@ -244,26 +270,80 @@ async def csrf_protect(request: Request) -> str:
     return token
 
 
+class SecurityMiddleware:
+    """
+    请求级安全检查的纯ASGI中间件
+    
+    每个请求只执行一次，直接读取scope中的查询字符串和请求头，不构造Request对象，
+    路由无需再逐个声明security_check/csrf_protect依赖
+    """
+    
+    def __init__(self, app, enforce_csrf: bool = False):
+        """
+        Args:
+            app: 下游ASGI应用
+            enforce_csrf: 是否对非安全方法的请求校验CSRF令牌
+        """
+        self.app = app
+        self.enforce_csrf = enforce_csrf
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = status.HTTP_400_BAD_REQUEST
+        detail = None
+        csrf_token = None
+        
+        # 检查查询参数，没有查询字符串时直接跳过
+        query_string = scope.get("query_string")
+        if query_string:
+            for key, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
+                if key == 'csrf_token':
+                    csrf_token = value
+                detail = _detect_threat(value)
+                if detail:
+                    break
+        
+        # 对于非安全方法的请求，验证CSRF令牌
+        if detail is None and self.enforce_csrf and scope["method"] not in SAFE_METHODS:
+            for name, value in scope["headers"]:
+                if name == b"x-csrf-token":
+                    csrf_token = value.decode("latin-1")
+                    break
+            if not csrf_token or not SecurityValidator.validate_csrf_token(None, csrf_token):
+                status_code = status.HTTP_403_FORBIDDEN
+                detail = "CSRF验证失败"
+        
+        if detail is None:
+            await self.app(scope, receive, send)
+            return
+        
+        response = ORJSONResponse(
+            status_code=status_code,
+            content={
+                "detail": detail,
+                "status_code": status_code,
+                "path": scope["path"],
+                "method": scope["method"]
+            }
+        )
+        await response(scope, receive, send)
+
+
 async def security_check(request: Request) -> bool:
     """安全检查依赖项"""
-    # 检查查询参数
-    query_params = dict(request.query_params)
+    # 检查查询参数，每个值只扫描一次（包括同名参数的所有取值）
+    query_params = request.query_params
     if query_params:
-        if not SecurityValidator.validate_sql_injection(query_params):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="检测到SQL注入尝试"
-            )
-        if not SecurityValidator.validate_xss(query_params):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="检测到XSS尝试"
-            )
-        if not SecurityValidator.validate_command_injection(query_params):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="检测到命令注入尝试"
-            )
+        for _, value in query_params.multi_items():
+            detail = _detect_threat(value)
+            if detail:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=detail
+                )
     
     # 检查请求频率限制（简化实现）
     if not SecurityValidator.validate_rate_limit(request):
@@ -273,30 +353,3 @@ async def security_check(request: Request) -> bool:
         )
     
     return True
-
-
-def validate_input_types(data: Dict[str, Any], expected_types: Dict[str, type]) -> Tuple[bool, Optional[str]]:
-    """
-    验证输入数据类型
-    :param data: 要验证的数据
-    :param expected_types: 期望的类型列表，例如 {'name': str, 'age': int}
-    :return: (is_valid, error_message)
-    """
-    for field, expected_type in expected_types.items():
-        if field in data:
-            value = data[field]
-            if not isinstance(value, expected_type):
-                # 尝试类型转换
-                try:
-                    if expected_type == int:
-                        data[field] = int(value)
-                    elif expected_type == float:
-                        data[field] = float(value)
-                    elif expected_type == str:
-                        data[field] = str(value)
-                    elif expected_type == bool:
-                        data[field] = bool(value)
-                except (ValueError, TypeError):
-                    return False, f"字段 '{field}' 类型错误，期望 {expected_type.__name__}"
-    
-    return True, None
\ No newline at end of file
@@ -1,26 +1,157 @@
 
 import asyncio
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import os
 import uuid
 import threading
 import time
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, Any, Optional, Tuple
 from fastapi import HTTPException, status
+from config import get_config
 from service.file_service import FileService
 from service.pdf_converter_v2 import PDFConverterV2, ConversionConfig
+from service.ocr_service import available_cpu_count
+
+
+# 工作进程内的PDF转换器，每个进程各自持有一份PaddleOCR模型
+_worker_converter: Optional[PDFConverterV2] = None
+# 工作进程向主进程回报任务状态和进度的队列
+_worker_events = None
+
+
+class _EventLogHandler(logging.handlers.QueueHandler):
+    """工作进程的日志处理器：把日志记录经事件队列交给主进程，由主进程按原有日志配置输出"""
+
+    def enqueue(self, record: logging.LogRecord):
+        self.queue.put((None, 'log', record))
+
+
+def _init_pdf_converter(events, ocr_threads: int, log_level: int):
+    """工作进程初始化：配置日志并创建本进程的PDF转换器"""
+    global _worker_converter, _worker_events
+    _worker_events = events
+    # spawn启动的进程没有加载logging.conf，且不应与主进程同时写同一个轮转日志文件，
+    # 所有日志统一经根日志记录器回传主进程
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(_EventLogHandler(events))
+    root_logger.setLevel(log_level)
+    # 各工作进程平分CPU核数，避免多个OCR模型同时推理时线程数超额；显式设置的OCR_THREADS优先
+    os.environ.setdefault('OCR_THREADS', str(ocr_threads))
+    config = ConversionConfig(
+        table_detection_enabled=True,
+        extract_images=True,
+        preserve_formatting=True
+    )
+    _worker_converter = PDFConverterV2(config)
+
+
+def _warm_up():
+    """预热任务：仅用于提前启动工作进程并完成转换器初始化"""
+
+
+def _convert_in_worker(task_id: str, file_path: str) -> Dict[str, Any]:
+    """在工作进程中执行转换，通过事件队列回报状态和进度"""
+    _worker_events.put((task_id, 'processing', time.time()))
+    
+    def progress_callback(progress: int):
+        """回报任务进度的回调函数"""
+        _worker_events.put((task_id, 'progress', progress))
+    
+    return _worker_converter.convert_pdf(file_path, progress_callback=progress_callback)
 
 
 class ConvertService:
     def __init__(self, file_service: FileService):
         self.file_service = file_service
-        # 初始化PDF转换器
-        config = ConversionConfig(
-            table_detection_enabled=True,
-            extract_images=True,
-            preserve_formatting=True
-        )
-        self.pdf_converter = PDFConverterV2(config)
-        # 任务状态存储
-        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.logger = logging.getLogger(f"service.{self.__class__.__name__}")
+        # 任务状态存储，按访问顺序排列，超出上限时淘汰最久未访问的已结束任务
+        self.tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_tasks = get_config().get('convert.max_tasks', 1000)
+        # 保护tasks的锁，任务状态会被请求线程和后台线程同时读写
+        self._tasks_lock = threading.Lock()
+        # 转换在独立进程中执行，不受GIL限制；每个进程各自初始化PDF转换器和OCR模型，
+        # 模型常驻内存，默认只启动1个进程，配置为0时才按CPU核数启动
+        self.max_workers = get_config().get('convert.max_workers', 1) or available_cpu_count()
+        # 进程池在首次使用时创建（启动阶段的warm_up或首个转换请求），
+        # 避免spawn启动的子进程重新导入本模块时又各自创建进程池
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # 当前进程池对应的事件队列，丢弃进程池时用于通知接收线程退出
+        self._events = None
+        self._executor_lock = threading.Lock()
+        atexit.register(self._shutdown_executor)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """获取进程池，不存在（尚未创建或已损坏被丢弃）时新建"""
+        with self._executor_lock:
+            if self._executor is None:
+                # 使用spawn启动工作进程，避免fork已加载的深度学习框架
+                mp_context = multiprocessing.get_context('spawn')
+                # 每个进程池使用独立的事件队列，工作进程异常退出时可能损坏旧队列
+                events = mp_context.SimpleQueue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=mp_context,
+                    initializer=_init_pdf_converter,
+                    initargs=(events, self._ocr_threads_per_worker(),
+                              logging.getLogger('service').getEffectiveLevel())
+                )
+                self._events = events
+                # 后台线程接收工作进程回报的状态和进度
+                threading.Thread(target=self._consume_events, args=(events,), name='convert-events', daemon=True).start()
+            return self._executor
+
+    def _ocr_threads_per_worker(self) -> int:
+        """
+        每个工作进程的OCR推理线程数：按实际工作进程数平分可用CPU核数，
+        默认单个工作进程时使用全部可用核数；只有工作进程数不少于核数时才为1
+        """
+        return max(1, available_cpu_count() // self.max_workers)
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        """丢弃已损坏的进程池，下次使用时重新创建（其余工作进程由进程池自行终止）"""
+        with self._executor_lock:
+            if self._executor is executor:
+                self.logger.warning("转换进程池已损坏（工作进程异常退出），将重新创建")
+                self._executor = None
+                self._stop_events(self._events)
+                self._events = None
+
+    @staticmethod
+    def _stop_events(events):
+        """
+        通知事件接收线程退出
+        
+        工作进程可能在写队列时被终止而未释放写锁，在单独的守护线程中写入结束标记，不阻塞调用方
+        """
+        if events is not None:
+            threading.Thread(target=events.put, args=((None, 'stop', None),), daemon=True).start()
+
+    def _shutdown_executor(self):
+        """进程退出时关闭进程池"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+            self._stop_events(self._events)
+            self._events = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def warm_up(self):
+        """创建进程池并为每个工作进程提交一个预热任务，使OCR模型在启动阶段而非首个请求时初始化"""
+        executor = self._get_executor()
+        try:
+            for _ in range(self.max_workers):
+                executor.submit(_warm_up)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
 
     def start_convert_task(self, file_id: str) -> str:
         """
@@ -52,7 +183,7 @@ class ConvertService:
             task_id = str(uuid.uuid4())
             
             # 初始化任务状态
-            self.tasks[task_id] = {
+            task = {
                 'file_id': file_id,
                 'file_path': file_info['file_path'],
                 'status': 'pending',  # pending, processing, completed, failed
@@ -60,13 +191,23 @@ class ConvertService:
                 'result': None,
                 'error': None,
                 'start_time': None,
-                'end_time': None
+                'end_time': None,
+                # 任务结果写入后才完成的future，供等待任务完成使用
+                'future': Future()
             }
+            with self._tasks_lock:
+                self.tasks[task_id] = task
+                self._evict_tasks()
             
-            # 启动异步转换任务
-            thread = threading.Thread(target=self._run_convert_task, args=(task_id,))
-            thread.daemon = True
-            thread.start()
+            try:
+                executor, worker_future = self._submit(task_id, task['file_path'])
+            except Exception:
+                # 提交失败时移除已登记的任务，避免留下永远处于pending的任务
+                with self._tasks_lock:
+                    self.tasks.pop(task_id, None)
+                raise
+            # 在锁外注册回调，已完成的future会在当前线程立即执行回调
+            worker_future.add_done_callback(partial(self._on_task_done, task_id, executor))
             
             return task_id
             
@@ -79,53 +220,84 @@ class ConvertService:
                 detail=f"启动转换任务失败: {str(e)}"
             )
 
-    def _run_convert_task(self, task_id: str):
-        """在后台线程中运行转换任务"""
+    def _submit(self, task_id: str, file_path: str) -> Tuple[ProcessPoolExecutor, Future]:
+        """提交转换任务到进程池，进程池已损坏时重建后重试一次，返回所用进程池和任务future"""
+        executor = self._get_executor()
         try:
-            task = self.tasks[task_id]
-            task['status'] = 'processing'
-            task['start_time'] = time.time()
-            
-            file_path = task['file_path']
-            
-            # 定义进度回调函数
-            def progress_callback(progress: int):
-                """更新任务进度的回调函数"""
-                if task_id in self.tasks:
-                    self.tasks[task_id]['progress'] = min(progress, 99)  # 最大99%，完成时设为100%
-            
-            # 使用PDF转换器进行转换，传入进度回调
-            result = self.pdf_converter.convert_pdf(file_path, progress_callback=progress_callback)
+            # 只传递可pickle的参数
+            return executor, executor.submit(_convert_in_worker, task_id, file_path)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+        executor = self._get_executor()
+        return executor, executor.submit(_convert_in_worker, task_id, file_path)
+
+    def _consume_events(self, events):
+        """在后台线程中接收工作进程回报的任务状态、进度和日志记录"""
+        while True:
+            task_id, kind, value = events.get()
+            if kind == 'stop':
+                # 进程池已丢弃或关闭
+                return
+            if kind == 'log':
+                # 交给主进程中同名的日志记录器，沿用其级别和处理器配置
+                record_logger = logging.getLogger(value.name)
+                if record_logger.isEnabledFor(value.levelno):
+                    record_logger.handle(value)
+                continue
+            with self._tasks_lock:
+                task = self.tasks.get(task_id)
+                if task is None:
+                    continue
+                if kind == 'processing' and task['status'] == 'pending':
+                    task['status'] = 'processing'
+                    task['start_time'] = value
+                elif kind == 'progress' and task['status'] == 'processing':
+                    task['progress'] = min(value, 99)  # 最大99%，完成时设为100%
+
+    def _on_task_done(self, task_id: str, executor: ProcessPoolExecutor, worker_future: Future):
+        """转换任务结束后更新任务状态"""
+        try:
+            result = worker_future.result()
+            error = None
+        except BrokenProcessPool as e:
+            # 工作进程异常退出（如内存不足或段错误），丢弃损坏的进程池，后续任务使用新的进程池
+            self._discard_executor(executor)
+            result = None
+            error = f"转换进程异常退出: {e}"
+        except Exception as e:
+            result = None
+            error = str(e)
+        
+        with self._tasks_lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return
             
-            if result.get('success', False):
-                # 读取转换后的Markdown内容
-                output_path = result['output_path']
-                with open(output_path, 'r', encoding='utf-8') as f:
-                    markdown_content = f.read()
-                
+            if result is not None and result.get('success', False):
+                # 只记录输出路径，Markdown内容通过内容接口从磁盘读取
                 task['status'] = 'completed'
                 task['result'] = {
                     'file_id': task['file_id'],
-                    'markdown_content': markdown_content,
-                    'output_path': output_path,
+                    'output_path': result['output_path'],
                     'processing_time': result['processing_time'],
                     'pages_processed': result['pages_processed'],
                     'tables_found': result['tables_found']
                 }
                 # 转换成功，进度设为100%
                 task['progress'] = 100
-            else:
+            elif result is not None:
                 task['status'] = 'failed'
                 task['error'] = result.get('error', '转换失败')
                 # 转换失败，进度设为100%
                 task['progress'] = 100
+            else:
+                task['status'] = 'failed'
+                task['error'] = error
             
             task['end_time'] = time.time()
-            
-        except Exception as e:
-            task['status'] = 'failed'
-            task['error'] = str(e)
-            task['end_time'] = time.time()
+            done = task['future']
+        
+        done.set_result(None)
 
     def get_task_status(self, task_id: str) -> Dict[str, Any]:
         """
@@ -137,21 +309,87 @@ class ConvertService:
         Returns:
             Dict: 任务状态信息
         """
-        if task_id not in self.tasks:
+        with self._tasks_lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                raise HTTPException(
+                    status_code=status.HTTP_200_OK,
+                    detail=f"任务不存在: {task_id}"
+                )
+            
+            self.tasks.move_to_end(task_id)
+            
+            return {
+                'task_id': task_id,
+                'file_id': task['file_id'],
+                'status': task['status'],
+                'progress': task['progress'],
+                'result': task['result'],
+                'error': task['error'],
+                'start_time': task['start_time'],
+                'end_time': task['end_time']
+            }
+
+    def get_task_output_path(self, task_id: str) -> str:
+        """
+        获取已完成任务的Markdown输出文件路径
+        
+        Args:
+            task_id: 任务ID
+            
+        Returns:
+            str: 输出文件路径
+        """
+        with self._tasks_lock:
+            task_exists = task_id in self.tasks
+        if not task_exists:
             raise HTTPException(
-                status_code=status.HTTP_200_OK,
+                status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"任务不存在: {task_id}"
             )
         
-        task = self.tasks[task_id]
+        task_status = self.get_task_status(task_id)
+        if task_status['status'] != 'completed':
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"任务未完成: {task_id}"
+            )
+        
+        output_path = task_status['result']['output_path']
+        if not os.path.isfile(output_path):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"转换结果文件不存在: {task_id}"
+            )
+        
+        return output_path
+
+    def _evict_tasks(self):
+        """任务数超出上限时，淘汰最久未访问的已结束任务（调用方需持有_tasks_lock）"""
+        for _ in range(len(self.tasks)):
+            if len(self.tasks) <= self.max_tasks:
+                break
+            task_id, task = self.tasks.popitem(last=False)
+            if task['status'] not in ('completed', 'failed'):
+                # 未结束的任务不淘汰，放回末尾
+                self.tasks[task_id] = task
+
+    async def wait_for_task(self, task_id: str, timeout: float) -> Dict[str, Any]:
+        """
+        等待任务完成（最多timeout秒）后返回任务状态，
+        任务完成时立即返回，无需客户端轮询
         
-        return {
-            'task_id': task_id,
-            'file_id': task['file_id'],
-            'status': task['status'],
-            'progress': task['progress'],
-            'result': task['result'],
-            'error': task['error'],
-            'start_time': task['start_time'],
-            'end_time': task['end_time']
-        }
\ No newline at end of file
+        Args:
+            task_id: 任务ID
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            Dict: 任务状态信息
+        """
+        with self._tasks_lock:
+            task = self.tasks.get(task_id)
+            future = task.get('future') if task else None
+        if future is not None and not future.done():
+            # 超时不会取消任务，仅返回当前状态
+            await asyncio.wait({asyncio.wrap_future(future)}, timeout=timeout)
+        return self.get_task_status(task_id)
@@ -41,7 +41,7 @@ class DOCXService:
         # 确保上传目录存在
         os.makedirs(self.upload_dir, exist_ok=True)
         
-        self.logger.info(f"DOCXService初始化完成，上传目录: {self.upload_dir}")
+        self.logger.info("DOCXService初始化完成，上传目录: %s", self.upload_dir)
 
     def extract_document_structure(self, docx_path: str) -> Dict[str, Any]:
         """
@@ -112,11 +112,11 @@ class DOCXService:
             # 提取表格和图片信息
             self._extract_tables_and_images(doc, structure)
             
-            self.logger.info(f"成功提取文档结构，共{len(structure['sections'])}个章节")
+            self.logger.info("成功提取文档结构，共%s个章节", len(structure['sections']))
             return structure
             
         except Exception as e:
-            self.logger.error(f"提取文档结构失败: {e}")
+            self.logger.error("提取文档结构失败: %s", e)
             raise
 
     def _get_heading_level(self, paragraph: Paragraph) -> int:
@@ -229,7 +229,7 @@ class DOCXService:
             }
             all_sections.append(section_info)
         
-        self.logger.info(f"找到{len(all_sections)}个章节，将全部保存为单独文件")
+        self.logger.info("找到%s个章节，将全部保存为单独文件", len(all_sections))
         return all_sections
 
     def _get_section_content(self, structure: Dict[str, Any], section_title: str) -> List[Dict]:
@@ -293,10 +293,10 @@ class DOCXService:
             # 保存新文档
             new_doc.save(output_path)
             
-            self.logger.info(f"末级目录内容已保存到: {output_path}")
+            self.logger.info("末级目录内容已保存到: %s", output_path)
             return output_path
         except Exception as e:
-            self.logger.error(f"保存末级目录内容失败: {e}")
+            self.logger.error("保存末级目录内容失败: %s", e)
             raise
 
     def _sanitize_filename(self, filename: str) -> str:
@@ -433,9 +433,9 @@ class DOCXService:
                                 new_para = new_cell.add_paragraph()
                                 self._deep_copy_paragraph_format(para, new_para)
                 
-                self.logger.info(f"成功复制表格，行数: {rows}, 列数: {cols}")
+                self.logger.info("成功复制表格，行数: %s, 列数: %s", rows, cols)
             except Exception as e:
-                self.logger.warning(f"复制表格失败: {e}")
+                self.logger.warning("复制表格失败: %s", e)
 
     def _get_elements_in_range(self, source_doc: Document, start_idx: int, end_idx: int) -> List[Dict]:
         """
@@ -513,7 +513,7 @@ class DOCXService:
                 }
         
         except Exception as e:
-            self.logger.warning(f"分析元素失败: {e}")
+            self.logger.warning("分析元素失败: %s", e)
         
         return None
 
@@ -610,7 +610,7 @@ class DOCXService:
                 self._deep_copy_run_format(source_run, new_run)
                 
         except Exception as e:
-            self.logger.warning(f"深度复制段落格式失败: {e}")
+            self.logger.warning("深度复制段落格式失败: %s", e)
 
     def _deep_copy_run_format(self, source_run, target_run):
         """
@@ -661,7 +661,7 @@ class DOCXService:
                 target_run.font.imprint = source_run.font.imprint
                 
         except Exception as e:
-            self.logger.warning(f"深度复制文本格式失败: {e}")
+            self.logger.warning("深度复制文本格式失败: %s", e)
 
     def _deep_copy_table(self, source_doc: Document, target_doc: Document, element_info: Dict):
         """
@@ -698,7 +698,7 @@ class DOCXService:
                             self._deep_copy_paragraph_format(para, new_para)
             
         except Exception as e:
-            self.logger.warning(f"深度复制表格失败: {e}")
+            self.logger.warning("深度复制表格失败: %s", e)
 
     def _deep_copy_image(self, source_doc: Document, target_doc: Document, element_info: Dict):
         """
@@ -782,7 +782,7 @@ class DOCXService:
                 target_paragraph.paragraph_format.space_after = source_paragraph.paragraph_format.space_after
                 
         except Exception as e:
-            self.logger.warning(f"复制段落格式失败: {e}")
+            self.logger.warning("复制段落格式失败: %s", e)
 
     def _copy_run_format(self, source_run, target_run):
         """
@@ -819,7 +819,7 @@ class DOCXService:
                 target_run.font.spacing = source_run.font.spacing
                 
         except Exception as e:
-            self.logger.warning(f"复制文本格式失败: {e}")
+            self.logger.warning("复制文本格式失败: %s", e)
 
     def process_document(self, docx_path: str, output_dir: str = None) -> Dict[str, Any]:
         """
@@ -861,11 +861,11 @@ class DOCXService:
                 }
             }
             
-            self.logger.info(f"文档处理完成，共保存{len(saved_files)}个末级目录文件")
+            self.logger.info("文档处理完成，共保存%s个末级目录文件", len(saved_files))
             return result
             
         except Exception as e:
-            self.logger.error(f"文档处理失败: {e}")
+            self.logger.error("文档处理失败: %s", e)
             return {
                 'success': False,
                 'error': str(e),
@@ -902,7 +902,7 @@ class DOCXService:
                 }
             }
         except Exception as e:
-            self.logger.error(f"获取文件信息失败: {e}")
+            self.logger.error("获取文件信息失败: %s", e)
             return None
 
     def _copy_tables_in_range(self, source_doc: Document, target_doc: Document, 
@@ -1024,7 +1024,7 @@ class DOCXService:
             if hasattr(shape, '_inline') and hasattr(shape._inline, 'graphic'):
                 # 这是一个简化的实现，实际图片复制需要更复杂的处理
                 # 这里暂时记录日志，表示检测到图片
-                self.logger.info(f"检测到图片，但图片复制功能需要更复杂的实现")
+                self.logger.info("检测到图片，但图片复制功能需要更复杂的实现")
 
 def main():
     docx_service = DOCXService(output_dir='files/output')
@@ -4,17 +4,27 @@
 """
 
 import os
-import uuid
-import json
+import random
+import shutil
+import stat
+import string
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Optional, BinaryIO
 import sys
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import get_config
+from security import SecurityValidator
+
+# 预先绑定常用方法，避免热路径上重复的属性查找
+_now = datetime.now
+_fromtimestamp = datetime.fromtimestamp
+# 文件ID随机部分可选字符（字母和数字）
+_FILE_ID_CHARS = string.ascii_letters + string.digits
 
 class FileService:
     """文件上传服务类"""
@@ -38,34 +48,38 @@ class FileService:
         else:
             self.upload_dir = upload_dir
         
+        # 是否在保存上传文件后强制落盘
+        self.fsync_uploads = self.config.get('storage.fsync_uploads', False)
+        
         # 确保上传目录存在
         os.makedirs(self.upload_dir, exist_ok=True)
         
-        self.logger.info(f"FileService初始化完成，上传目录: {self.upload_dir}")
+        self.logger.info("FileService初始化完成，上传目录: %s", self.upload_dir)
     
     def generate_file_id(self) -> str:
         """生成唯一的文件ID"""
-        import datetime
-        import random
-        import string
-        
         # 获取当前日期时间，格式：YYYYMMDD-HHMMSS
-        current_time = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        current_time = _now().strftime("%Y%m%d%H%M%S")
         
         # 生成8位随机字符（字母和数字）
-        random_chars = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+        random_chars = ''.join(random.choices(_FILE_ID_CHARS, k=8))
         
         # 组合成格式：file-日期时分秒-随机8位ID
         file_id = f"file-{current_time}-{random_chars}"
         
         return file_id
     
-    def save_file(self, file_data: bytes, filename: str, file_type: str = None) -> Dict[str, Any]:
+    # 保存文件时每次读取的块大小
+    COPY_CHUNK_SIZE = 1024 * 1024  # 1MB
+    # 存储文件扩展名（上传仅允许PDF）
+    STORAGE_EXTENSION = '.pdf'
+    
+    def save_file(self, file_stream: BinaryIO, filename: str, file_type: str = None) -> Dict[str, Any]:
         """
         保存文件到uploads目录
         
         Args:
-            file_data: 文件数据（字节）
+            file_stream: 文件数据流（二进制文件对象），按块读取，避免整个文件驻留内存
             filename: 原始文件名
             file_type: 文件类型（可选，自动检测）
             
@@ -73,26 +87,32 @@ class FileService:
             Dict: 包含状态码和file_id的JSON响应
         """
         try:
-            self.logger.info(f"开始处理文件上传: {filename}")
+            self.logger.info("开始处理文件上传: %s", filename)
             
             # 生成唯一文件ID
             file_id = self.generate_file_id()
             
-            # 获取文件扩展名
-            file_extension = os.path.splitext(filename)[1] if '.' in filename else ''
+            # 获取文件扩展名（统一小写，与按file_id查找时的存储文件名一致）
+            file_extension = os.path.splitext(filename)[1].lower()
             
             # 构建存储文件名
             storage_filename = f"{file_id}{file_extension}"
             file_path = os.path.join(self.upload_dir, storage_filename)
             
-            # 保存文件
-            with open(file_path, 'wb') as f:
-                f.write(file_data)
+            # 分块保存文件
+            with open(file_path, 'wb', buffering=self.COPY_CHUNK_SIZE) as f:
+                shutil.copyfileobj(file_stream, f, self.COPY_CHUNK_SIZE)
+                # 写入位置即文件大小，无需逐块累加
+                file_size = f.tell()
+                if self.fsync_uploads:
+                    f.flush()
+                    # 仅需数据落盘，不支持fdatasync的平台退回fsync
+                    getattr(os, 'fdatasync', os.fsync)(f.fileno())
             
             # 检测文件类型
-            detected_file_type = file_type or self._detect_file_type(filename, file_extension)
+            detected_file_type = file_type or self._detect_file_type(file_extension)
             
-            self.logger.info(f"文件上传成功 - ID: {file_id}, 文件名: {filename}, 大小: {len(file_data)} bytes")
+            self.logger.info("文件上传成功 - ID: %s, 文件名: %s, 大小: %s bytes", file_id, filename, file_size)
             
             # 返回JSON格式响应
             return {
@@ -101,13 +121,13 @@ class FileService:
                 'message': '文件上传成功',
                 'file_info': {
                     'original_filename': filename,
-                    'file_size': len(file_data),
+                    'file_size': file_size,
                     'file_type': detected_file_type
                 }
             }
             
         except Exception as e:
-            self.logger.error(f"文件上传失败: {str(e)}")
+            self.logger.error("文件上传失败: %s", e)
             return {
                 'status_code': 500,
                 'file_id': None,
@@ -125,31 +145,33 @@ class FileService:
         Returns:
             Dict: 文件信息或None
         """
-        # 扫描上传目录，查找匹配的文件
-        for filename in os.listdir(self.upload_dir):
-            if filename == f"{file_id}.pdf":
-                file_path = os.path.join(self.upload_dir, filename)
-                if os.path.isfile(file_path):
-                    # 获取文件信息
-                    file_size = os.path.getsize(file_path)
-                    file_extension = os.path.splitext(filename)[1]
-                    
-                    # 从文件名推断原始文件名（这里简化处理）
-                    original_filename = f"{file_id}{file_extension}"
-                    
-                    self.logger.info(f"查询文件信息: {file_id}")
-                    return {
-                        'file_id': file_id,
-                        'original_filename': original_filename,
-                        'storage_filename': filename,
-                        'file_path': file_path,
-                        'file_size': file_size,
-                        'file_type': self._detect_file_type(filename, file_extension),
-                        'upload_time': datetime.fromtimestamp(os.path.getctime(file_path)).isoformat(),
-                        'status': 'uploaded'
-                    }
+        # 按file_id直接定位存储文件，无需扫描整个上传目录
+        file_path = self._get_storage_path(file_id)
+        try:
+            # 一次stat同时获取文件类型、大小和时间
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
+            file_stat = None
         
-        self.logger.warning(f"文件不存在: {file_id}")
+        if file_stat is not None and stat.S_ISREG(file_stat.st_mode):
+            filename = os.path.basename(file_path)
+            
+            # 从文件名推断原始文件名（这里简化处理）
+            original_filename = filename
+            
+            self.logger.info("查询文件信息: %s", file_id)
+            return {
+                'file_id': file_id,
+                'original_filename': original_filename,
+                'storage_filename': filename,
+                'file_path': file_path,
+                'file_size': file_stat.st_size,
+                'file_type': self._detect_file_type(self.STORAGE_EXTENSION),
+                'upload_time': _fromtimestamp(file_stat.st_ctime).isoformat(timespec='seconds'),
+                'status': 'uploaded'
+            }
+        
+        self.logger.warning("文件不存在: %s", file_id)
         return None
     
     def delete_file(self, file_id: str) -> Dict[str, Any]:
@@ -163,29 +185,17 @@ class FileService:
             Dict: 删除结果
         """
         try:
-            # 查找要删除的文件
-            file_found = False
-            file_path = None
-            
-            for filename in os.listdir(self.upload_dir):
-                if filename.startswith(file_id):
-                    file_path = os.path.join(self.upload_dir, filename)
-                    if os.path.isfile(file_path):
-                        file_found = True
-                        break
-            
-            if not file_found or not file_path:
-                self.logger.error(f"删除失败，文件不存在: {file_id}")
+            # 直接删除物理文件，文件是否存在由删除结果判断，无需先扫描目录
+            try:
+                os.remove(self._get_storage_path(file_id))
+            except FileNotFoundError:
+                self.logger.error("删除失败，文件不存在: %s", file_id)
                 return {
                     'status_code': 404,
                     'message': '文件不存在'
                 }
             
-            # 删除物理文件
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            self.logger.info(f"文件删除成功: {file_id}")
+            self.logger.info("文件删除成功: %s", file_id)
             
             return {
                 'status_code': 200,
@@ -194,80 +204,99 @@ class FileService:
             }
             
         except Exception as e:
-            self.logger.error(f"文件删除失败: {str(e)}")
+            self.logger.error("文件删除失败: %s", e)
             return {
                 'status_code': 500,
                 'message': f'文件删除失败: {str(e)}',
                 'error': str(e)
             }
     
-    def list_files(self) -> Dict[str, Any]:
+    def list_files(self, limit: Optional[int] = None, offset: int = 0) -> Dict[str, Any]:
         """
-        列出所有已上传的文件
+        列出已上传的文件，按文件名（即上传时间）排序，支持分页
         
+        Args:
+            limit: 返回的最大文件数，None表示全部
+            offset: 跳过的文件数
+            
         Returns:
             Dict: 文件列表信息
         """
         self.logger.info("获取文件列表")
         
+        # 扫描上传目录中的所有文件，scandir的目录项自带类型信息
+        with os.scandir(self.upload_dir) as entries:
+            file_entries = sorted((entry for entry in entries if entry.is_file()), key=lambda e: e.name)
+        
+        total_files = len(file_entries)
+        end = None if limit is None else offset + limit
+        
         files = []
-        # 扫描上传目录中的所有文件
-        for filename in os.listdir(self.upload_dir):
-            file_path = os.path.join(self.upload_dir, filename)
-            if os.path.isfile(file_path):
-                # 从文件名提取file_id（假设文件名格式为file_id + 扩展名）
-                file_id = os.path.splitext(filename)[0]
-                file_extension = os.path.splitext(filename)[1]
-                
-                # 获取文件信息
-                file_size = os.path.getsize(file_path)
-                upload_time = datetime.fromtimestamp(os.path.getctime(file_path)).isoformat()
-                file_type = self._detect_file_type(filename, file_extension)
-                
-                files.append({
-                    'file_id': file_id,
-                    'original_filename': filename,
-                    'file_size': file_size,
-                    'file_type': file_type,
-                    'upload_time': upload_time
-                })
+        # 只对当前页的文件执行stat
+        for entry in file_entries[offset:end]:
+            filename = entry.name
+            # 从文件名提取file_id（假设文件名格式为file_id + 扩展名）
+            file_id, file_extension = os.path.splitext(filename)
+            
+            # 获取文件信息
+            file_stat = entry.stat()
+            file_size = file_stat.st_size
+            upload_time = _fromtimestamp(file_stat.st_ctime).isoformat(timespec='seconds')
+            file_type = self._detect_file_type(file_extension)
+            
+            files.append({
+                'file_id': file_id,
+                'original_filename': filename,
+                'file_size': file_size,
+                'file_type': file_type,
+                'upload_time': upload_time
+            })
         
         return {
             'status_code': 200,
-            'total_files': len(files),
+            'total_files': total_files,
             'files': files
         }
     
-    def _detect_file_type(self, filename: str, extension: str) -> str:
+    def _get_storage_path(self, file_id: str) -> str:
         """
-        检测文件类型
+        根据文件ID获取存储路径（上传仅允许PDF，存储文件名为file_id + .pdf）
+        
+        Args:
+            file_id: 文件ID
+            
+        Returns:
+            str: 文件存储路径
+        """
+        # 只取文件名部分，防止通过file_id进行路径遍历
+        return os.path.join(self.upload_dir, f"{os.path.basename(file_id)}{self.STORAGE_EXTENSION}")
+    
+    # 常见文件类型映射（按小写扩展名）
+    _EXT_MAP = MappingProxyType({
+        '.pdf': 'pdf',
+        '.docx': 'document',
+        '.xls': 'spreadsheet',
+        '.xlsx': 'spreadsheet',
+        '.zip': 'archive',
+        '.rar': 'archive',
+        '.jpg': 'image',
+        '.jpeg': 'image',
+        '.png': 'image',
+        '.gif': 'image',
+        '.bmp': 'image'
+    })
+    
+    def _detect_file_type(self, extension: str) -> str:
+        """
+        根据扩展名检测文件类型
         
         Args:
-            filename: 文件名
             extension: 文件扩展名
             
         Returns:
             str: 文件类型
         """
-        # 常见文件类型映射
-        file_type_mapping = {
-            '.pdf': 'pdf',
-            '.docx': 'document',
-            '.xls': 'spreadsheet',
-            '.xlsx': 'spreadsheet',
-            '.zip': 'archive',
-            '.rar': 'archive'
-        }
-        
-        file_type = file_type_mapping.get(extension.lower(), 'unknown')
-        
-        # 特殊处理：如果文件名包含特定关键词
-        if 'pdf' in filename.lower():
-            file_type = 'pdf'
-        elif any(img_ext in filename.lower() for img_ext in ['image', 'photo', 'picture']):
-            file_type = 'image'
-        
-        return file_type
+        return self._EXT_MAP.get(extension.lower(), 'unknown')
 
     def is_allowed_file(self, filename: str) -> bool:
         """
@@ -280,4 +309,4 @@ class FileService:
             bool: 是否允许
         """
         extension = os.path.splitext(filename)[1].lower()
-        return extension in ['.pdf']
\ No newline at end of file
+        return extension in SecurityValidator.SAFE_PDF_EXTENSIONS
\ No newline at end of file
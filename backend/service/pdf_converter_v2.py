@@ -14,6 +14,7 @@ from dataclasses import dataclass
 from pathlib import Path
 from PIL import Image
 import io
+from operator import itemgetter
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -35,6 +36,7 @@ class ConversionConfig:
     # 性能配置
     chunk_size: int = 10  # 每批处理的页面数
     progress_update_interval: int = 10  # 进度更新间隔（页面数）
+    ocr_batch_size: int = 8  # 每次批量OCR的图片数
     
     # 进度回调配置
     progress_callback: Optional[callable] = None  # 进度回调函数
@@ -91,9 +93,9 @@ class PDFConverterV2:
         if output_path is None:
             output_path = self._generate_output_path(pdf_path)
         
-        self.logger.info(f"开始转换PDF: {pdf_path}")
-        self.logger.info(f"输出路径: {output_path}")
-        self.logger.info(f"页面范围: {start_page}-{end_page or '末尾'}")
+        self.logger.info("开始转换PDF: %s", pdf_path)
+        self.logger.info("输出路径: %s", output_path)
+        self.logger.info("页面范围: %s-%s", start_page, end_page or '末尾')
         
         try:
             # 打开PDF文件
@@ -108,7 +110,7 @@ class PDFConverterV2:
                 actual_start = max(1, start_page)
                 actual_end = min(total_pages, end_page)
                 
-                self.logger.info(f"实际处理页面: {actual_start}-{actual_end} (共{total_pages}页)")
+                self.logger.info("实际处理页面: %s-%s (共%s页)", actual_start, actual_end, total_pages)
 
                 # 分批次处理页面
                 markdown_content = self._process_pages_in_batches(doc, actual_start, actual_end, progress_callback)
@@ -120,9 +122,10 @@ class PDFConverterV2:
                 self.processing_stats['end_time'] = time.time()
                 processing_time = self.processing_stats['end_time'] - self.processing_stats['start_time']
                 
-                self.logger.info(f"转换完成! 处理了{self.processing_stats['processed_pages']}页，"
-                               f"发现{self.processing_stats['tables_found']}个表格，"
-                               f"耗时{processing_time:.2f}秒")
+                self.logger.info("转换完成! 处理了%s页，发现%s个表格，耗时%.2f秒",
+                                 self.processing_stats['processed_pages'],
+                                 self.processing_stats['tables_found'],
+                                 processing_time)
                 
                 return {
                     'success': True,
@@ -134,7 +137,7 @@ class PDFConverterV2:
                 }
                 
         except Exception as e:
-            self.logger.error(f"转换过程中发生错误: {e}")
+            self.logger.error("转换过程中发生错误: %s", e)
             self.processing_stats['errors'].append(str(e))
             return {
                 'success': False,
@@ -147,7 +150,8 @@ class PDFConverterV2:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF文件不存在: {pdf_path}")
         
-        if not pdf_path.lower().endswith('.pdf'):
+        # 只对扩展名做小写转换，而非整个路径
+        if os.path.splitext(pdf_path)[1].lower() != '.pdf':
             raise ValueError("输入文件必须是PDF格式")
         
         if start_page < 1:
@@ -180,7 +184,7 @@ class PDFConverterV2:
         for batch_start in range(start_page - 1, end_page, chunk_size):
             batch_end = min(batch_start + chunk_size, end_page)
             
-            self.logger.info(f"处理页面批次: {batch_start + 1}-{batch_end}")
+            self.logger.info("处理页面批次: %s-%s", batch_start + 1, batch_end)
             
             batch_content = self._process_page_batch(doc, batch_start, batch_end)
             markdown_parts.append(batch_content)
@@ -188,14 +192,14 @@ class PDFConverterV2:
             # 更新进度
             processed = min(batch_end - start_page + 1, self.processing_stats['total_pages'])
             progress = (processed / (end_page - start_page + 1)) * 100
-            self.logger.info(f"处理进度: {progress:.1f}% ({processed}/{end_page - start_page + 1}页)")
+            self.logger.info("处理进度: %.1f%% (%s/%s页)", progress, processed, end_page - start_page + 1)
             
             # 调用进度回调函数
             if progress_callback:
                 try:
                     progress_callback(int(progress))
                 except Exception as e:
-                    self.logger.warning(f"进度回调调用失败: {e}")
+                    self.logger.warning("进度回调调用失败: %s", e)
         
         return '\n'.join(markdown_parts)
     
@@ -216,7 +220,7 @@ class PDFConverterV2:
                 
                 # 定期更新进度
                 if self.processing_stats['processed_pages'] % self.config.progress_update_interval == 0:
-                    self.logger.info(f"已处理 {self.processing_stats['processed_pages']} 页")
+                    self.logger.info("已处理 %s 页", self.processing_stats['processed_pages'])
                     
             except Exception as e:
                 error_msg = f"处理第{page_num + 1}页时发生错误: {e}"
@@ -258,7 +262,7 @@ class PDFConverterV2:
             extracted_table = table.extract()
             return [[str(cell).strip() if cell else "" for cell in row] for row in extracted_table]
         except Exception as e:
-            self.logger.warning(f"提取表格数据时发生错误: {e}")
+            self.logger.warning("提取表格数据时发生错误: %s", e)
             return []
     
     def _is_valid_table(self, table_data: List[List[str]]) -> bool:
@@ -266,8 +270,14 @@ class PDFConverterV2:
         if not table_data or len(table_data) < 2:
             return False
         
-        max_columns = max(len(row) for row in table_data)
-        has_content = any(cell.strip() for row in table_data for cell in row)
+        # 单次遍历同时统计最大列数和是否有内容
+        max_columns = 0
+        has_content = False
+        for row in table_data:
+            if len(row) > max_columns:
+                max_columns = len(row)
+            if not has_content:
+                has_content = any(cell.strip() for cell in row)
         
         return max_columns >= self.config.table_min_columns and has_content
     
@@ -338,26 +348,30 @@ class PDFConverterV2:
             # 合并所有元素
             all_elements = []
             processed_table_indices = set()
+            # 循环前预先绑定方法，避免每个文本块重复查找属性
+            add_element = all_elements.append
+            find_table_overlap = self._find_table_overlap
+            format_text_block = self._format_text_block
             
             for block in sorted_blocks:
                 if "lines" in block:  # 文本块
                     block_bbox = block["bbox"]
                     
                     # 检查是否在表格区域内
-                    table_idx, overlap_ratio = self._find_table_overlap(block_bbox, table_positions)
+                    table_idx, overlap_ratio = find_table_overlap(block_bbox, table_positions)
                     
                     if table_idx >= 0 and overlap_ratio > 0.7:
                         # 添加表格占位符
                         if table_idx not in processed_table_indices:
                             placeholder = f"<!-- TABLE_PLACEHOLDER_{table_idx} -->"
-                            all_elements.append(('table', table_idx, table_positions[table_idx][0][1], placeholder))
+                            add_element(('table', table_idx, table_positions[table_idx][0][1], placeholder))
                             processed_table_indices.add(table_idx)
                         continue
                     else:
                         # 正常文本块
-                        block_text = self._format_text_block(block)
+                        block_text = format_text_block(block)
                         if block_text.strip():
-                            all_elements.append(('text', -1, block_bbox[1], block_text))
+                            add_element(('text', -1, block_bbox[1], block_text))
             
             # 添加图片占位符
             if image_positions and self.config.extract_images:
@@ -366,7 +380,7 @@ class PDFConverterV2:
                     all_elements.append(('image', img_idx, img_bbox[1], placeholder))
             
             # 按Y坐标排序并生成内容
-            all_elements.sort(key=lambda x: x[2])
+            all_elements.sort(key=itemgetter(2))
             formatted_content = []
             
             for element_type, _, _, content in all_elements:
@@ -378,7 +392,7 @@ class PDFConverterV2:
             return '\n'.join(formatted_content)
             
         except Exception as e:
-            self.logger.warning(f"使用PyMuPDF提取第{page_idx + 1}页文本时发生错误: {e}")
+            self.logger.warning("使用PyMuPDF提取第%s页文本时发生错误: %s", page_idx + 1, e)
             return f"<!-- 文本提取错误: {e} -->"
     
     def _find_table_overlap(self, block_bbox, table_positions) -> Tuple[int, float]:
@@ -411,7 +425,7 @@ class PDFConverterV2:
                         tables_dict[i] = f"**表格:**\n\n{markdown_table}\n"
                         
         except Exception as e:
-            self.logger.warning(f"表格提取失败: {e}")
+            self.logger.warning("表格提取失败: %s", e)
         
         return tables_dict
     
@@ -443,7 +457,7 @@ class PDFConverterV2:
                     table_positions.append((bbox, i))
                     
         except Exception as e:
-            self.logger.warning(f"表格位置检测失败: {e}")
+            self.logger.warning("表格位置检测失败: %s", e)
         
         # 按Y坐标排序表格
         table_positions.sort(key=lambda x: x[0][1])
@@ -463,27 +477,50 @@ class PDFConverterV2:
                 return {}
             
             images_dict = {}
+            # 先收集需要OCR的图片，再按批次交给OCR服务
+            pending_ocr = []
             for img_index, img_info in enumerate(image_list):
                 try:
                     image_markdown = f"\n**[第{page_idx + 1}页, 图片{img_index + 1}]**\n"
-                    self.logger.info(f"\n图片 :{image_markdown}\n")
-                    ##OCR图片内容
+                    self.logger.info("\n图片 :%s\n", image_markdown)
                     pix = fitz.Pixmap(page.parent, img_info[0])
                     if pix.n < 5:
                         img_data = pix.tobytes("png")
-                        pil_img = Image.open(io.BytesIO(img_data))
-                        ocr_text = self.ocr_service.perform_ocr(pil_img)
-                        self.logger.info(f"OCR 结果: \n{ocr_text}")
-                        image_markdown += f"```OCR 内容 [第{page_idx + 1}页, 图片{img_index + 1}]: \n{ocr_text} \n```\n"
+                        pending_ocr.append((img_index, Image.open(io.BytesIO(img_data))))
 
                     images_dict[img_index] = image_markdown
                 except Exception as img_error:
-                    self.logger.warning(f"处理图片 {img_index} 时发生错误: {img_error}")
+                    self.logger.warning("处理图片 %s 时发生错误: %s", img_index, img_error)
                     images_dict[img_index] = f"``` OCR内容图片失败-{img_index}: {img_error} \n```\n"
+
+            ##OCR图片内容
+            batch_size = max(1, self.config.ocr_batch_size)
+            for start in range(0, len(pending_ocr), batch_size):
+                batch = pending_ocr[start:start + batch_size]
+                try:
+                    ocr_texts = self.ocr_service.perform_ocr_batch([pil_img for _, pil_img in batch])
+                    ocr_results = [(img_index, ocr_text, None) for (img_index, _), ocr_text in zip(batch, ocr_texts)]
+                except Exception as batch_error:
+                    # 批量识别失败时逐张重试，只有出错的图片标记为失败
+                    self.logger.warning("批量OCR图片时发生错误，改为逐张识别: %s", batch_error)
+                    ocr_results = []
+                    for img_index, pil_img in batch:
+                        try:
+                            ocr_results.append((img_index, self.ocr_service.perform_ocr(pil_img), None))
+                        except Exception as ocr_error:
+                            ocr_results.append((img_index, None, ocr_error))
+
+                for img_index, ocr_text, ocr_error in ocr_results:
+                    if ocr_error is not None:
+                        self.logger.warning("OCR图片 %s 时发生错误: %s", img_index, ocr_error)
+                        images_dict[img_index] = f"``` OCR内容图片失败-{img_index}: {ocr_error} \n```\n"
+                        continue
+                    self.logger.info("OCR 结果: \n%s", ocr_text)
+                    images_dict[img_index] += f"```OCR 内容 [第{page_idx + 1}页, 图片{img_index + 1}]: \n{ocr_text} \n```\n"
                     
             return images_dict
         except Exception as e:
-            self.logger.warning(f"图片提取失败: {e}")
+            self.logger.warning("图片提取失败: %s", e)
             return {}
 
     def _detect_image_positions(self, doc: fitz.Document, page_idx: int) -> List[Tuple[Tuple[float, float, float, float], int]]:
@@ -520,7 +557,7 @@ class PDFConverterV2:
                 image_positions.append((img_bbox, img_index))
                     
         except Exception as e:
-            self.logger.warning(f"表格位置检测失败: {e}")
+            self.logger.warning("表格位置检测失败: %s", e)
             return []
         
         image_positions.sort(key=lambda x: x[0][1])
@@ -547,32 +584,32 @@ class PDFConverterV2:
         
         # 按Y轴坐标分组，合并同一行的文本
         lines_by_y = {}
+        # 循环前预先绑定方法，避免每行/每个span重复查找属性
+        group_for_y = lines_by_y.setdefault
+        add_line = formatted_lines.append
         
         for line in block["lines"]:
-            if not line.get("spans"):
+            spans = line.get("spans")
+            if not spans:
                 continue
                 
             # 获取行的Y轴坐标（使用第一个span的bbox）
-            if line["spans"] and "bbox" in line["spans"][0]:
-                y_coord = line["spans"][0]["bbox"][1]  # 使用Y1坐标
+            if "bbox" in spans[0]:
+                y_coord = spans[0]["bbox"][1]  # 使用Y1坐标
                 
                 # 四舍五入到最近的整数，处理微小差异
-                y_key = round(y_coord)
-                
-                if y_key not in lines_by_y:
-                    lines_by_y[y_key] = []
-                
-                lines_by_y[y_key].extend(line["spans"])
+                group_for_y(round(y_coord), []).extend(spans)
         
         # 按Y坐标排序（从大到小，PDF坐标系Y轴向上递增）
-        sorted_y_keys = sorted(lines_by_y.keys(), reverse=True)
+        sorted_y_keys = sorted(lines_by_y, reverse=True)
         
         for y_key in sorted_y_keys:
             spans = lines_by_y[y_key]
             line_spans = []
+            add_span = line_spans.append
             
             # 按X坐标排序（从左到右）
-            sorted_spans = sorted(spans, key=lambda s: s.get("bbox", [0, 0, 0, 0])[0] if "bbox" in s else 0)
+            sorted_spans = sorted(spans, key=lambda s: s["bbox"][0] if "bbox" in s else 0)
             
             for span in sorted_spans:
                 text = span["text"]
@@ -583,12 +620,11 @@ class PDFConverterV2:
                     font_flags = span.get("flags", 0)
                     is_title = font_size > 14 or (font_flags & 2)
                     
-                    line_spans.append(f"**{cleaned_text}**" if is_title else cleaned_text)
+                    add_span(f"**{cleaned_text}**" if is_title else cleaned_text)
             
             if line_spans:
                 # 将同一行的span用空格连接，保留原始空格结构
-                line_content = " ".join(line_spans)
-                formatted_lines.append(line_content)
+                add_line(" ".join(line_spans))
         
         if not formatted_lines:
             return ""
@@ -642,7 +678,7 @@ class PDFConverterV2:
             with open(output_path, 'w', encoding='utf-8') as f:
                 f.write(content)
             
-            self.logger.info(f"结果已保存到: {output_path}")
+            self.logger.info("结果已保存到: %s", output_path)
             
         except Exception as e:
             raise Exception(f"保存输出文件失败: {e}")
@@ -734,23 +770,23 @@ def main():
         )
         
         if result['success']:
-            self.logger.info(f"✅ 转换成功!")
-            self.logger.info(f"   输出文件: {result['output_path']}")
-            self.logger.info(f"   处理页面: {result['pages_processed']}")
-            self.logger.info(f"   发现表格: {result['tables_found']}")
-            self.logger.info(f"   处理时间: {result['processing_time']:.2f}秒")
-            self.logger.info(f"   详细信息: {result.get('details', '无')}")
+            self.logger.info("✅ 转换成功!")
+            self.logger.info("   输出文件: %s", result['output_path'])
+            self.logger.info("   处理页面: %s", result['pages_processed'])
+            self.logger.info("   发现表格: %s", result['tables_found'])
+            self.logger.info("   处理时间: %.2f秒", result['processing_time'])
+            self.logger.info("   详细信息: %s", result.get('details', '无'))
             sys.exit(0)
         else:
-            self.logger.error(f"❌ 转换失败: {result.get('error', '未知错误')}")
+            self.logger.error("❌ 转换失败: %s", result.get('error', '未知错误'))
             if result.get('errors'):
                 self.logger.error("详细错误:")
                 for error in result['errors']:
-                    self.logger.error(f"  - {error}")
+                    self.logger.error("  - %s", error)
             sys.exit(1)
             
     except Exception as e:
-        self.logger.error(f"❌ 程序执行错误: {e}")
+        self.logger.error("❌ 程序执行错误: %s", e)
         sys.exit(1)
 
 
@@ -0,0 +1,173 @@
+"""
+转换服务测试用例
+覆盖进程池转换、任务等待、Markdown内容接口、任务淘汰和工作进程异常退出
+"""
+
+import os
+import signal
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import Future
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes.file_routes import file_router, get_file_service, get_convert_service
+from service.file_service import FileService
+from service.convert_service import ConvertService
+
+API_HEADERS = {"X-API-Key": "12345"}
+
+
+def _make_pdf(path: str):
+    """生成一个只包含文字的小PDF"""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), "BiddingChecker convert service test")
+    doc.save(path)
+    doc.close()
+
+
+def _make_task(status: str) -> dict:
+    """构造一个指定状态的任务记录"""
+    return {
+        'file_id': 'file-test',
+        'file_path': '',
+        'status': status,
+        'progress': 0,
+        'result': None,
+        'error': None,
+        'start_time': None,
+        'end_time': None,
+        'future': Future()
+    }
+
+
+class TestConvertService(unittest.TestCase):
+    """转换服务测试类"""
+
+    @classmethod
+    def setUpClass(cls):
+        """启动转换进程池并上传测试PDF"""
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.file_service = FileService(upload_dir=cls.temp_dir.name)
+        cls.convert_service = ConvertService(cls.file_service)
+        cls.convert_service.max_workers = 1
+        cls.convert_service.warm_up()
+
+        app = FastAPI()
+        app.include_router(file_router, prefix="/api")
+        app.dependency_overrides[get_file_service] = lambda: cls.file_service
+        app.dependency_overrides[get_convert_service] = lambda: cls.convert_service
+        cls.client = TestClient(app)
+
+        pdf_path = os.path.join(cls.temp_dir.name, "sample.pdf")
+        _make_pdf(pdf_path)
+        with open(pdf_path, "rb") as f:
+            response = cls.client.post(
+                "/api/file/upload",
+                files={"file": ("sample.pdf", f, "application/pdf")},
+                headers=API_HEADERS
+            )
+        assert response.status_code == 200, response.text
+        cls.file_id = response.json()['file_id']
+
+    @classmethod
+    def tearDownClass(cls):
+        """关闭进程池并清理临时目录"""
+        cls.convert_service._shutdown_executor()
+        cls.temp_dir.cleanup()
+
+    def _start_convert(self) -> str:
+        """启动转换任务并返回任务ID"""
+        response = self.client.post("/api/file/convert2md", json={"file_id": self.file_id}, headers=API_HEADERS)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()['task_id']
+
+    def _wait_result(self, task_id: str) -> dict:
+        """等待任务结束并返回任务状态"""
+        response = self.client.get(f"/api/file/convert2md/result/{task_id}", params={"wait": 120}, headers=API_HEADERS)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_convert_and_get_content(self):
+        """测试转换完成后通过内容接口获取Markdown"""
+        task_id = self._start_convert()
+        task_status = self._wait_result(task_id)
+        self.assertEqual(task_status['status'], 'completed', task_status)
+        self.assertEqual(task_status['progress'], 100)
+        self.assertNotIn('markdown_content', task_status['result'])
+
+        response = self.client.get(f"/api/file/convert2md/content/{task_id}", headers=API_HEADERS)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['content-type'].startswith('text/markdown'))
+        with open(task_status['result']['output_path'], encoding='utf-8') as f:
+            self.assertEqual(response.text, f.read())
+
+    def test_content_of_unfinished_task(self):
+        """测试未完成任务的内容接口返回400"""
+        with self.convert_service._tasks_lock:
+            self.convert_service.tasks['task-pending'] = _make_task('pending')
+        try:
+            response = self.client.get("/api/file/convert2md/content/task-pending", headers=API_HEADERS)
+            self.assertEqual(response.status_code, 400)
+        finally:
+            with self.convert_service._tasks_lock:
+                self.convert_service.tasks.pop('task-pending', None)
+
+    def test_content_of_unknown_task(self):
+        """测试不存在任务的内容接口返回404"""
+        response = self.client.get("/api/file/convert2md/content/task-unknown", headers=API_HEADERS)
+        self.assertEqual(response.status_code, 404)
+
+    def test_wait_timeout(self):
+        """测试等待超时后返回任务当前状态"""
+        with self.convert_service._tasks_lock:
+            self.convert_service.tasks['task-waiting'] = _make_task('processing')
+        try:
+            start = time.monotonic()
+            response = self.client.get(
+                "/api/file/convert2md/result/task-waiting", params={"wait": 0.5}, headers=API_HEADERS
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['status'], 'processing')
+            self.assertLess(time.monotonic() - start, 5)
+        finally:
+            with self.convert_service._tasks_lock:
+                self.convert_service.tasks.pop('task-waiting', None)
+
+    def test_evict_tasks(self):
+        """测试超出上限时只淘汰最久未访问的已结束任务"""
+        service = ConvertService(self.file_service)
+        service.max_tasks = 2
+        service.tasks['old-pending'] = _make_task('pending')
+        service.tasks['old-completed'] = _make_task('completed')
+        service.tasks['old-failed'] = _make_task('failed')
+        service.tasks['new-completed'] = _make_task('completed')
+        service._evict_tasks()
+        self.assertEqual(list(service.tasks), ['new-completed', 'old-pending'])
+
+    @unittest.skipUnless(hasattr(signal, 'SIGKILL'), "需要SIGKILL信号")
+    def test_worker_crash(self):
+        """测试工作进程异常退出后任务标记为失败，后续任务使用新的进程池正常完成"""
+        task_id = self._start_convert()
+        for pid in list(self.convert_service._executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        task_status = self._wait_result(task_id)
+        # 任务可能在进程被终止前已完成
+        self.assertIn(task_status['status'], ('completed', 'failed'))
+        if task_status['status'] == 'failed':
+            self.assertIn('转换进程异常退出', task_status['error'])
+
+        task_status = self._wait_result(self._start_convert())
+        self.assertEqual(task_status['status'], 'completed', task_status)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,152 +1,292 @@
 import pdfplumber
+import hashlib
+import multiprocessing
 import os
+import pickle
 
 """
 测试表格处理函数
 """
 
-def get_cell_span(row_idx, col_idx, table_data):
+# HTML特殊字符转义表，str.translate一次遍历完成所有替换
+_HTML_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+def build_cell_spans(table_data):
     """
-    计算单元格的rowspan和colspan（基于表格数据推断合并单元格）
-    :param row_idx: 当前单元格行索引
-    :param col_idx: 当前单元格列索引
-    :param table_data: 表格数据（二维列表）
-    :return: (rowspan, colspan)
+    一次性计算表格中每个单元格右侧和下方连续空单元格的数量（基于表格数据推断合并单元格）
+    :param table_data: 已清理（去除首尾空白）的表格数据（二维列表）
+    :return: (right_empty, down_empty)，单元格(r, c)的rowspan为1 + down_empty[r][c]，colspan为1 + right_empty[r][c]
     """
-    rowspan = 1
-    colspan = 1
+    row_count = len(table_data)
+    col_count = max((len(row) for row in table_data), default=0)
     
-    # 检查当前单元格是否为空（如果是空单元格，可能是合并单元格的一部分）
-    current_cell = table_data[row_idx][col_idx] if row_idx < len(table_data) and col_idx < len(table_data[row_idx]) else ""
+    # 空单元格标记；超出行长度的位置视为非空，使连续计数在行尾/短行处中断
+    is_empty = [
+        [not cell for cell in row] + [False] * (col_count - len(row))
+        for row in table_data
+    ]
     
-    # 如果当前单元格为空，则不需要计算合并
-    if not current_cell or current_cell.strip() == "":
-        return 1, 1
+    right_empty = [[0] * col_count for _ in range(row_count)]
+    down_empty = [[0] * col_count for _ in range(row_count)]
     
-    # 计算colspan：向右检查连续的空单元格
-    for c in range(col_idx + 1, len(table_data[row_idx])):
-        next_cell = table_data[row_idx][c] if c < len(table_data[row_idx]) else ""
-        if not next_cell or next_cell.strip() == "":
-            colspan += 1
-        else:
-            break
+    # 每行从右向左扫描一次，计算右侧连续空单元格数
+    for r in range(row_count):
+        empty_row = is_empty[r]
+        right_row = right_empty[r]
+        for c in range(col_count - 2, -1, -1):
+            if empty_row[c + 1]:
+                right_row[c] = right_row[c + 1] + 1
+    
+    # 每列从下向上扫描一次，计算下方连续空单元格数
+    for r in range(row_count - 2, -1, -1):
+        empty_below = is_empty[r + 1]
+        down_row = down_empty[r]
+        down_below = down_empty[r + 1]
+        for c in range(col_count):
+            if empty_below[c]:
+                down_row[c] = down_below[c] + 1
     
-    # 计算rowspan：向下检查连续的空单元格
-    for r in range(row_idx + 1, len(table_data)):
-        if col_idx < len(table_data[r]):
-            next_cell = table_data[r][col_idx]
-            if not next_cell or next_cell.strip() == "":
-                rowspan += 1
+    return right_empty, down_empty
+
+def render_table_html(table):
+    """
+    将单个表格渲染为HTML（合并单元格使用rowspan/colspan）
+    :param table: 表格数据（二维列表）
+    :return: HTML表格字符串列表（每个表格行一个元素，以换行符结尾），可直接writelines写入文件
+    """
+    # 构建HTML表格
+    html_table = ["<table border='1' style='border-collapse: collapse;'>\n"]
+    # 一次性清理所有单元格文本，合并跨度计算和渲染共用同一份结果
+    cleaned_table = [[cell.strip() if cell else "" for cell in row] for row in table]
+
+    # 没有空单元格时不存在合并单元格，直接逐行渲染，跳过跨度计算
+    if all(all(row) for row in cleaned_table):
+        for row in cleaned_table:
+            html_table.append(
+                "  <tr>\n"
+                + "".join(f"    <td>{cell_text.translate(_HTML_ESCAPE)}</td>\n" for cell_text in row)
+                + "  </tr>\n"
+            )
+        html_table.append("</table>\n\n\n")
+        return html_table
+
+    # 预先计算所有单元格的合并跨度
+    right_empty, down_empty = build_cell_spans(cleaned_table)
+    # 记录已处理的单元格（避免合并单元格重复渲染），按行展开的位图，(r, c)对应下标r * col_count + c
+    col_count = len(right_empty[0]) if right_empty else 0
+    processed = bytearray(len(cleaned_table) * col_count)
+
+    # 逐行处理表格数据，每行只拼接一个字符串
+    for row_idx, row in enumerate(cleaned_table):
+        cells_html = []
+        row_offset = row_idx * col_count
+        for col_idx, cell_text in enumerate(row):
+            # 跳过已处理的合并单元格
+            if processed[row_offset + col_idx]:
+                continue
+
+            # 转义HTML特殊字符
+            cell_text = cell_text.translate(_HTML_ESCAPE)
+
+            # 计算合并单元格的跨度（空单元格本身不合并）
+            if cell_text:
+                rowspan = 1 + down_empty[row_idx][col_idx]
+                colspan = 1 + right_empty[row_idx][col_idx]
             else:
-                break
+                rowspan, colspan = 1, 1
+
+            # 普通单元格（大多数情况）：无需标记已处理，也无需构建属性
+            if rowspan == 1 and colspan == 1:
+                cells_html.append(f"    <td>{cell_text}</td>\n")
+                continue
+
+            # 标记合并的单元格为已处理
+            for start in range(row_offset + col_idx, (row_idx + rowspan) * col_count, col_count):
+                processed[start:start + colspan] = b"\x01" * colspan
+
+            # 构建合并单元格属性
+            attr = f" rowspan='{rowspan}'" if rowspan > 1 else ""
+            if colspan > 1:
+                attr += f" colspan='{colspan}'"
+
+            cells_html.append(f"    <td{attr}>{cell_text}</td>\n")
+
+        html_table.append("  <tr>\n" + "".join(cells_html) + "  </tr>\n")
+
+    # 结束HTML表格
+    html_table.append("</table>\n\n\n")
+    return html_table
+
+# 支持的PDF解析引擎：pdfplumber（纯Python）和pymupdf（基于MuPDF C引擎，解析更快）
+ENGINES = ("pdfplumber", "pymupdf")
+
+# 表格提取结果的磁盘缓存根目录，按PDF内容哈希和解析引擎分目录存放
+CACHE_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "bidding_checker")
+# 缓存格式版本：修改表格提取逻辑时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+# 各解析引擎的表格检测参数（pdfplumber另外按页传入线条对象），参与缓存键计算
+PDFPLUMBER_TABLE_SETTINGS = {
+    "vertical_strategy": "lines",  # 按竖线识别表格列
+    "horizontal_strategy": "lines",  # 按横线识别表格行
+}
+PYMUPDF_TABLE_SETTINGS = {
+    "strategy": "lines",  # 按线条识别表格
+}
+
+# 工作进程中打开的PDF、解析引擎和缓存目录（每个进程只打开一次）
+_worker_pdf = None
+_worker_engine = None
+_worker_cache_dir = None
+
+def _file_sha256(path, chunk_size=1 << 20):
+    """分块计算文件的sha256，作为缓存键"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_key(engine):
+    """
+    缓存目录名：由解析引擎、缓存版本、引擎库版本和表格检测参数共同决定，
+    任一项变化时不会误用旧的缓存结果
+    """
+    if engine == "pymupdf":
+        import fitz  # PyMuPDF
+        lib_version, settings = fitz.VersionBind, PYMUPDF_TABLE_SETTINGS
+    else:
+        lib_version, settings = pdfplumber.__version__, PDFPLUMBER_TABLE_SETTINGS
+    digest = hashlib.sha256(repr((CACHE_VERSION, lib_version, sorted(settings.items()))).encode()).hexdigest()
+    return f"{engine}-v{CACHE_VERSION}-{digest[:12]}"
+
+def _open_pdf(pdf_path, engine):
+    """按指定引擎打开PDF文件"""
+    if engine == "pymupdf":
+        import fitz  # PyMuPDF
+        # fitz的文件不存在异常不是内置FileNotFoundError的子类，这里统一抛出内置异常
+        if not os.path.isfile(pdf_path):
+            raise FileNotFoundError(pdf_path)
+        return fitz.open(pdf_path)
+    return pdfplumber.open(pdf_path)
+
+def _init_page_worker(pdf_path, engine, cache_dir):
+    """工作进程初始化：打开PDF文件，页面按需解析"""
+    global _worker_pdf, _worker_engine, _worker_cache_dir
+    _worker_pdf = _open_pdf(pdf_path, engine)
+    _worker_engine = engine
+    _worker_cache_dir = cache_dir
+
+def _extract_tables_pdfplumber(page_idx):
+    """使用pdfplumber提取单页表格数据"""
+    page = _worker_pdf.pages[page_idx]
+    # 每页只读取一次线条对象，横竖两个方向共用
+    lines = page.objects.get("lines", [])
+    table_settings = {
+        **PDFPLUMBER_TABLE_SETTINGS,
+        "explicit_vertical_lines": lines,
+        "explicit_horizontal_lines": lines,
+    }
+    # 只做一次表格检测，直接从检测结果提取单元格文本（等价于extract_tables，避免重复检测）
+    tables = [table.extract() for table in page.find_tables(table_settings=table_settings)]
+    # 释放已解析页面的缓存
+    page.close()
+    return tables
+
+def _extract_tables_pymupdf(page_idx):
+    """使用PyMuPDF提取单页表格数据"""
+    page = _worker_pdf[page_idx]
+    return [table.extract() for table in page.find_tables(**PYMUPDF_TABLE_SETTINGS)]
+
+def _process_page(page_idx):
+    """
+    在工作进程中提取单页表格并渲染为HTML
+    :param page_idx: 页面索引（从0开始）
+    :return: 该页所有表格的HTML行列表
+    """
+    # 只缓存解析出的表格数据，HTML渲染开销很小，每次重新生成
+    cache_file = os.path.join(_worker_cache_dir, f"page_{page_idx + 1}.pkl") if _worker_cache_dir else None
+    tables = None
+    if cache_file and os.path.isfile(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                tables = pickle.load(f)
+        except Exception:
+            # 缓存文件损坏时重新解析
+            tables = None
+
+    if tables is None:
+        if _worker_engine == "pymupdf":
+            tables = _extract_tables_pymupdf(page_idx)
         else:
-            break
-    
-    return rowspan, colspan
+            tables = _extract_tables_pdfplumber(page_idx)
+        if cache_file:
+            # 先写临时文件再替换，避免并发或中断时留下不完整的缓存
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "wb") as f:
+                pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+
+    return [render_table_html(table) for table in tables]
+
+def _iter_page_tables(pdf_path, engine, cache_dir, page_count, processes=None):
+    """
+    按页面顺序逐页产出表格HTML
+    进程数不超过页数；只需一个进程时（如单页文档）直接在当前进程处理，不启动进程池
+    """
+    global _worker_pdf
+    processes = min(processes or os.cpu_count() or 1, page_count)
+    if processes <= 1:
+        _init_page_worker(pdf_path, engine, cache_dir)
+        try:
+            for page_idx in range(page_count):
+                yield _process_page(page_idx)
+        finally:
+            _worker_pdf.close()
+            _worker_pdf = None
+        return
+
+    # 各页面表格提取互不依赖，按页并行处理；imap保持页面顺序
+    with multiprocessing.Pool(processes, initializer=_init_page_worker, initargs=(pdf_path, engine, cache_dir)) as pool:
+        yield from pool.imap(_process_page, range(page_count))
 
-def pdf_tables_to_md_pure_python(pdf_path, output_md_path):
+def pdf_tables_to_md_pure_python(pdf_path, output_md_path, processes=None, engine="pdfplumber", use_cache=True):
     """
     纯Python实现：PDF表格转Markdown（HTML格式）
     :param pdf_path: 输入PDF文件路径
     :param output_md_path: 输出Markdown文件路径
+    :param processes: 并行处理页面的进程数，默认使用全部CPU核数（不超过页数）
+    :param engine: PDF解析引擎，"pdfplumber"或"pymupdf"
+    :param use_cache: 是否使用磁盘缓存，同一PDF再次处理时直接读取已解析的表格
     """
-    # 初始化Markdown内容
-    md_content = "# PDF提取的表格（纯Python实现）\n\n"
+    if engine not in ENGINES:
+        raise ValueError(f"不支持的解析引擎: {engine}，可选: {', '.join(ENGINES)}")
+
     table_index = 1
 
     # 打开PDF文件
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # 遍历所有页面
-            for page_num, page in enumerate(pdf.pages, 1):
-                # 提取当前页面的所有表格
-                tables = page.extract_tables(
-                    table_settings={
-                        "vertical_strategy": "lines",  # 按竖线识别表格列
-                        "horizontal_strategy": "lines",  # 按横线识别表格行
-                        "explicit_vertical_lines": page.objects.get("lines", []),
-                        "explicit_horizontal_lines": page.objects.get("lines", []),
-                    }
-                )
-                # 提取单元格的详细信息（用于判断合并单元格）
-                # 使用 pdfplumber 的 find_tables 方法获取表格结构信息
-                table_cells = []
-                try:
-                    # 使用 find_tables 获取表格结构
-                    found_tables = page.find_tables(table_settings={
-                        "vertical_strategy": "lines",
-                        "horizontal_strategy": "lines",
-                        "explicit_vertical_lines": page.objects.get("lines", []),
-                        "explicit_horizontal_lines": page.objects.get("lines", []),
-                    })
-                    
-                    # 提取第一个表格的单元格信息（如果有的话）
-                    if found_tables:
-                        table_obj = found_tables[0]
-                        # 获取表格的边界框信息
-                        table_bbox = table_obj.bbox
-                        # 这里可以添加更多单元格信息提取逻辑
-                        
-                except Exception as e:
-                    print(f"提取表格单元格信息时出错: {e}")
-                    table_cells = []
-
-                if not tables:
-                    continue
+        # 只读取页数，各页面在工作进程中独立解析
+        with _open_pdf(pdf_path, engine) as pdf:
+            page_count = len(pdf.pages) if engine == "pdfplumber" else pdf.page_count
 
+        # 按文件内容哈希定位缓存目录，PDF内容变化后自动失效
+        cache_dir = None
+        if use_cache:
+            cache_dir = os.path.join(CACHE_ROOT, _file_sha256(pdf_path), _cache_key(engine))
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # 边处理边写入Markdown文件，不在内存中累积整个文档
+        with open(output_md_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            f.write("# PDF提取的表格（纯Python实现）\n\n")
+            page_results = _iter_page_tables(pdf_path, engine, cache_dir, page_count, processes)
+            for page_num, page_tables in enumerate(page_results, 1):
                 # 处理当前页面的每个表格
-                for table in tables:
-                    md_content += f"## 表格 {table_index}（第{page_num}页）\n\n"
+                for table_html in page_tables:
+                    f.write(f"## 表格 {table_index}（第{page_num}页）\n\n")
                     table_index += 1
-
-                    # 构建HTML表格
-                    html_table = ["<table border='1' style='border-collapse: collapse;'>"]
-                    # 记录已处理的单元格（避免合并单元格重复渲染）
-                    processed_cells = set()
-
-                    # 逐行处理表格数据
-                    for row_idx, row in enumerate(table):
-                        html_table.append("  <tr>")
-                        for col_idx, cell_text in enumerate(row):
-                            # 跳过已处理的合并单元格
-                            if (row_idx, col_idx) in processed_cells:
-                                continue
-
-                            # 清理单元格文本
-                            cell_text = cell_text.strip() if cell_text else ""
-                            # 转义HTML特殊字符
-                            cell_text = cell_text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
-                            # 计算合并单元格的跨度
-                            rowspan, colspan = get_cell_span(row_idx, col_idx, table)
-
-                            # 标记合并的单元格为已处理
-                            for r in range(row_idx, row_idx + rowspan):
-                                for c in range(col_idx, col_idx + colspan):
-                                    processed_cells.add((r, c))
-
-                            # 构建HTML单元格
-                            cell_attrs = []
-                            if rowspan > 1:
-                                cell_attrs.append(f"rowspan='{rowspan}'")
-                            if colspan > 1:
-                                cell_attrs.append(f"colspan='{colspan}'")
-
-                            if cell_attrs:
-                                html_table.append(f"    <td {' '.join(cell_attrs)}>{cell_text}</td>")
-                            else:
-                                html_table.append(f"    <td>{cell_text}</td>")
-
-                        html_table.append("  </tr>")
-
-                    # 结束HTML表格
-                    html_table.append("</table>\n\n")
-                    # 将HTML表格添加到Markdown内容
-                    md_content += "\n".join(html_table) + "\n"
-
-        # 写入Markdown文件
-        with open(output_md_path, "w", encoding="utf-8") as f:
-            f.write(md_content)
+                    # 将HTML表格写入Markdown文件
+                    f.writelines(table_html)
         print(f"✅ 成功生成Markdown文件：{output_md_path}")
 
     except FileNotFoundError:
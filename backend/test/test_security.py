@@ -0,0 +1,37 @@
+"""
+安全检查测试用例
+覆盖查询参数注入特征检测：正常参数、SQL注入、XSS和命令注入
+"""
+
+import os
+import sys
+import unittest
+
+# 添加backend目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from security import _detect_threat
+
+
+class TestDetectThreat(unittest.TestCase):
+    """注入特征检测测试类"""
+
+    def test_clean_value(self):
+        """测试正常参数不被拦截"""
+        self.assertIsNone(_detect_threat("report_2024.pdf"))
+
+    def test_sql_injection(self):
+        """测试SQL注入特征"""
+        self.assertEqual(_detect_threat("1 union select password from users"), "检测到SQL注入尝试")
+
+    def test_xss(self):
+        """测试XSS特征"""
+        self.assertEqual(_detect_threat("<script>alert(1)</script>"), "检测到XSS尝试")
+
+    def test_command_injection(self):
+        """测试命令注入特征"""
+        self.assertEqual(_detect_threat("$(whoami)"), "检测到命令注入尝试")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,10 +6,16 @@
 import logging
 import logging.handlers
 import os
+import queue
 from datetime import datetime
 from typing import Optional, Dict, Any
 
 
+def _find_caller_disabled(stack_info: bool = False, stacklevel: int = 1):
+    """替代Logger.findCaller，不回溯调用栈，直接返回未知调用位置"""
+    return "(unknown)", 0, "(unknown)", None
+
+
 class LoggerFactory:
     """日志工厂类，统一管理日志配置和实例"""
     
@@ -20,14 +26,19 @@ class LoggerFactory:
         'file_format': '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
         'date_format': '%Y-%m-%d %H:%M:%S',
         'log_dir': 'logs',
+        'log_file_prefix': 'app',  # 日志文件名前缀，所有日志记录器共用同一个文件
         'max_file_size': 10 * 1024 * 1024,  # 10MB
         'backup_count': 5,
         'enable_file_log': True,
-        'enable_console_log': True
+        'enable_console_log': True,
+        # 是否记录调用位置（文件名、行号），关闭后日志调用不再回溯调用栈，
+        # 文件日志中的调用位置显示为[(unknown):0]
+        'enable_caller_info': True
     }
     
     _config = DEFAULT_CONFIG.copy()
-    _loggers = {}
+    # 按日志文件路径共享的文件处理器，所有日志记录器共用一个文件描述符
+    _file_handlers: Dict[str, logging.handlers.RotatingFileHandler] = {}
     
     @classmethod
     def configure(cls, config: Optional[Dict[str, Any]] = None):
@@ -42,19 +53,20 @@ class LoggerFactory:
     @classmethod
     def get_logger(cls, name: str, **kwargs) -> logging.Logger:
         """获取或创建日志记录器"""
-        if name in cls._loggers:
-            return cls._loggers[name]
+        # logging.getLogger本身按名称缓存日志记录器，已添加处理器即说明已初始化
+        logger = logging.getLogger(name)
+        if logger.handlers:
+            return logger
         
         # 合并配置
         config = cls._config.copy()
         config.update(kwargs)
         
-        logger = logging.getLogger(name)
         logger.setLevel(config['level'])
         
-        # 避免重复添加处理器
-        if logger.handlers:
-            return logger
+        # 不需要调用位置时跳过findCaller的调用栈回溯
+        if not config['enable_caller_info']:
+            logger.findCaller = _find_caller_disabled
         
         # 控制台处理器
         if config['enable_console_log']:
@@ -68,15 +80,24 @@ class LoggerFactory:
         
         # 文件处理器
         if config['enable_file_log']:
+            log_file = os.path.join(
+                config['log_dir'], 
+                f"{config['log_file_prefix']}_{datetime.now().strftime('%Y%m%d')}.log"
+            )
+            logger.addHandler(cls._get_file_handler(log_file, config))
+        
+        return logger
+    
+    @classmethod
+    def _get_file_handler(cls, log_file: str, config: Dict[str, Any]) -> logging.handlers.RotatingFileHandler:
+        """获取日志文件对应的共享文件处理器，不存在时创建"""
+        key = os.path.abspath(log_file)
+        file_handler = cls._file_handlers.get(key)
+        if file_handler is None:
             file_formatter = logging.Formatter(
                 config['file_format'],
                 datefmt=config['date_format']
             )
-            log_file = os.path.join(
-                config['log_dir'], 
-                f"{name}_{datetime.now().strftime('%Y%m%d')}.log"
-            )
-            
             file_handler = logging.handlers.RotatingFileHandler(
                 log_file,
                 maxBytes=config['max_file_size'],
@@ -84,15 +105,13 @@ class LoggerFactory:
                 encoding='utf-8'
             )
             file_handler.setFormatter(file_formatter)
-            logger.addHandler(file_handler)
-        
-        cls._loggers[name] = logger
-        return logger
+            cls._file_handlers[key] = file_handler
+        return file_handler
     
     @classmethod
     def get_service_logger(cls, service_name: str) -> logging.Logger:
-        """为服务类获取专用日志记录器"""
-        return cls.get_logger(f"service.{service_name}")
+        """为服务类获取专用日志记录器（服务日志调用频繁，不记录调用位置）"""
+        return cls.get_logger(f"service.{service_name}", enable_caller_info=False)
     
     @classmethod
     def get_route_logger(cls, route_name: str) -> logging.Logger:
@@ -114,19 +133,60 @@ class LogMixin:
     
     def log_info(self, message: str, **kwargs):
         """记录信息级别日志"""
-        self.logger.info(message, extra=kwargs)
+        # 级别未启用时直接返回，不构造extra参数
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(message, extra=kwargs or None)
     
     def log_error(self, message: str, **kwargs):
         """记录错误级别日志"""
-        self.logger.error(message, extra=kwargs)
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.error(message, extra=kwargs or None)
     
     def log_warning(self, message: str, **kwargs):
         """记录警告级别日志"""
-        self.logger.warning(message, extra=kwargs)
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning(message, extra=kwargs or None)
     
     def log_debug(self, message: str, **kwargs):
         """记录调试级别日志"""
-        self.logger.debug(message, extra=kwargs)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(message, extra=kwargs or None)
+
+
+def start_queue_logging(logger: logging.Logger) -> logging.handlers.QueueListener:
+    """
+    将日志记录器现有的处理器转移到后台线程
+    
+    调用方只把日志记录放入队列，文件和控制台I/O由QueueListener线程完成；
+    QueueHandler入队前仍会在调用线程中格式化消息（合并参数和异常信息）
+    
+    Args:
+        logger: 日志记录器
+        
+    Returns:
+        QueueListener: 已启动的监听器，停止时传给stop_queue_logging
+    """
+    log_queue = queue.SimpleQueue()
+    handlers = list(logger.handlers)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener.start()
+    return listener
+
+
+def stop_queue_logging(logger: logging.Logger, listener: logging.handlers.QueueListener):
+    """停止后台日志线程，写出剩余记录并恢复原有处理器"""
+    listener.stop()
+    
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+    for handler in listener.handlers:
+        logger.addHandler(handler)
 
 
 def setup_logging(config: Optional[Dict[str, Any]] = None):